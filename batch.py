@@ -0,0 +1,296 @@
+import sys
+sys.dont_write_bytecode = True
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from pseudo import ENGINES, MAX_DEPTH, Options, Runner, memory_size
+
+arg_parser = argparse.ArgumentParser(prog="pseudo.py batch", formatter_class=argparse.RawTextHelpFormatter)
+
+arg_parser.add_argument('programs', nargs="+", metavar="program", help="source files to run, or directories to run every .pseudo file in")
+
+arg_parser.add_argument(
+    "--inputs",
+    action="append",
+    default=[],
+    metavar="PATH",
+    help="file to read INPUT from, or a directory of them, can be repeated.\nevery program runs once per input file (default: once, with no input)"
+)
+
+arg_parser.add_argument(
+    "--jobs",
+    type=int,
+    metavar="N",
+    help="programs to run at the same time (default: one per core)"
+)
+
+arg_parser.add_argument(
+    "--timeout",
+    type=float,
+    default=10,
+    metavar="SECONDS",
+    help="wall-clock time a run gets before it is killed, 0 for no limit (default: 10)"
+)
+
+arg_parser.add_argument(
+    "--output",
+    type=argparse.FileType("w"),
+    default=sys.stdout,
+    metavar="FILE",
+    help="write the results to FILE instead of stdout, one JSON object per line as runs finish"
+)
+
+arg_parser.add_argument(
+    "--engine",
+    choices=ENGINES,
+    default="interpreter",
+    help="execution engine to run the programs with"
+)
+
+arg_parser.add_argument(
+    "--no-newlines",
+    action="store_true",
+    default=False,
+    help="toggle auto newlines when printing"
+)
+
+arg_parser.add_argument(
+    "--max-depth",
+    type=int,
+    default=MAX_DEPTH,
+    metavar="N",
+    help="maximum depth of nested subroutine calls, 0 for no limit besides memory"
+)
+
+arg_parser.add_argument(
+    "--max-steps",
+    type=int,
+    metavar="N",
+    help="stop a program after N loop iterations and subroutine calls (default: no limit)"
+)
+
+arg_parser.add_argument(
+    "--max-memory",
+    type=memory_size,
+    metavar="BYTES",
+    help="stop a program when the arrays it holds would take more than BYTES, eg. 256M\n(default: no limit)"
+)
+
+arg_parser.add_argument(
+    "--no-check",
+    action="store_true",
+    default=False,
+    help="skip the static type check"
+)
+
+arg_parser.add_argument(
+    "--no-optimize",
+    action="store_true",
+    default=False,
+    help="run the programs as written"
+)
+
+arg_parser.add_argument(
+    "--memoize",
+    action="store_true",
+    default=False,
+    help="cache the results of pure FUNCTIONs"
+)
+
+def expand(paths, ext=None):
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)) and (ext is None or name.endswith(ext)))
+        else:
+            files.append(path)
+    return files
+
+# the peak memory of a worker is reset before each run where the platform allows it (linux), so it is the run's own
+def reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_memory():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else, and never goes down
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+# runs the jobs it is sent until it gets None, with the parser loaded once up front
+def work(conn, options):
+    runner = Runner()
+
+    while True:
+        job = conn.recv()
+
+        if job is None:
+            break
+
+        program, input = job
+        reset_peak()
+
+        try:
+            with open(program, "r") as f:
+                source = f.read()
+
+            stdin = ""
+            if input is not None:
+                with open(input, "r") as f:
+                    stdin = f.read()
+        except OSError as e:
+            conn.send({"status": "error", "stdout": "", "error": str(e), "line": None, "memory": None})
+            continue
+
+        result = runner.run(source, stdin, Options(**options, file=os.path.basename(program)))
+
+        conn.send({
+            "status": "error" if result.error else "ok",
+            "stdout": result.stdout,
+            "error": result.error,
+            "line": result.line,
+            "memory": peak_memory()
+        })
+
+class Worker:
+    def __init__(self, context, options):
+        self.conn, child = context.Pipe()
+
+        self.process = context.Process(target=work, args=(child, options), daemon=True)
+        self.process.start()
+        child.close()
+
+        # the (program, input) it is running, and when it was sent
+        self.job, self.start = None, None
+
+    def send(self, job):
+        self.job, self.start = job, time.perf_counter()
+        self.conn.send(job)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+
+        self.process.join()
+
+def main(argv=None):
+    args = arg_parser.parse_args(argv)
+
+    programs = expand(args.programs, ".pseudo")
+    inputs = expand(args.inputs) or [None]
+    jobs = deque((program, input) for program in programs for input in inputs)
+
+    options = {
+        "engine": args.engine,
+        "no_newlines": args.no_newlines,
+        "max_depth": args.max_depth,
+        "max_steps": args.max_steps,
+        "max_memory": args.max_memory,
+        "check": not args.no_check,
+        "optimize": not args.no_optimize,
+        "memoize": args.memoize
+    }
+
+    size = args.jobs or (len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+    context = multiprocessing.get_context()
+    workers = [Worker(context, options) for _ in range(max(1, min(size, len(jobs))))]
+
+    counts, start = {}, time.perf_counter()
+
+    def report(worker, result):
+        program, input = worker.job
+        result = {
+            "program": program,
+            "input": input,
+            "status": result["status"],
+            "stdout": result.get("stdout", ""),
+            "error": result["error"],
+            "line": result.get("line"),
+            "time": round(time.perf_counter() - worker.start, 6),
+            "memory": result.get("memory")
+        }
+
+        args.output.write(json.dumps(result) + "\n")
+        args.output.flush()
+
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        worker.job = None
+
+    def next_job(worker):
+        if jobs:
+            worker.send(jobs.popleft())
+
+    try:
+        for worker in workers:
+            next_job(worker)
+
+        while True:
+            busy = [worker for worker in workers if worker.job is not None]
+
+            if not busy:
+                break
+
+            timeout = None
+            if args.timeout:
+                timeout = max(0, min(worker.start for worker in busy) + args.timeout - time.perf_counter())
+
+            ready = wait([worker.conn for worker in busy], timeout)
+
+            for i, worker in enumerate(workers):
+                if worker.job is None:
+                    continue
+
+                if worker.conn in ready:
+                    try:
+                        report(worker, worker.conn.recv())
+                        next_job(worker)
+                        continue
+                    except EOFError:
+                        result = {"status": "crashed", "error": "The worker running the program died"}
+                elif args.timeout and time.perf_counter() - worker.start >= args.timeout:
+                    result = {"status": "timeout", "error": f"Timed out after {args.timeout:g}s"}
+                else:
+                    continue
+
+                # a run that hangs or takes its worker down with it is replaced by a fresh worker
+                worker.kill()
+                report(worker, result)
+
+                workers[i] = Worker(context, options)
+                next_job(workers[i])
+    finally:
+        for worker in workers:
+            if worker.job is None:
+                worker.stop()
+            else:
+                worker.kill()
+
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{sum(counts.values())} runs in {time.perf_counter() - start:.2f}s with {len(workers)} workers ({summary or 'nothing to run'})", file=sys.stderr)
\ No newline at end of file
@@ -0,0 +1,173 @@
+import sys
+sys.dont_write_bytecode = True
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+ENGINES = ["interpreter", "compiled", "transpiled"]
+
+arg_parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+
+arg_parser.add_argument('names', nargs="*", metavar="name", help="benchmarks to run (default: every program in benchmarks/)")
+
+arg_parser.add_argument(
+    "--engine",
+    action="append",
+    choices=ENGINES,
+    help="engine to benchmark, can be repeated (default: all of them)"
+)
+
+arg_parser.add_argument(
+    "--repeat",
+    type=int,
+    default=5,
+    metavar="N",
+    help="timed runs per benchmark, after one untimed warm up run"
+)
+
+arg_parser.add_argument(
+    "--flag",
+    action="append",
+    default=[],
+    metavar="ARG",
+    help="extra argument to pass to pseudo.py, can be repeated (eg. --flag=--no-cache)"
+)
+
+arg_parser.add_argument(
+    "--output",
+    metavar="FILE",
+    help="save the results as JSON to FILE"
+)
+
+arg_parser.add_argument(
+    "--baseline",
+    metavar="FILE",
+    help="compare against results saved earlier with --output"
+)
+
+arg_parser.add_argument(
+    "--threshold",
+    type=float,
+    default=0.1,
+    metavar="RATIO",
+    help="slowdown over the baseline median that counts as a regression (default: 0.1)"
+)
+
+# wall time, peak memory in bytes (None where the platform can't tell), exit code, stdout and stderr of one run
+def run_once(command):
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=out, stderr=err)
+
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+            # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+            memory = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+            memory = None
+
+        elapsed = time.perf_counter() - start
+
+        out.seek(0)
+        err.seek(0)
+        return elapsed, memory, process.returncode, out.read(), err.read()
+
+def run_benchmark(path, engine, repeat, flags):
+    command = [sys.executable, os.path.join(ROOT, "pseudo.py"), f"--engine={engine}", *flags, path]
+
+    # warms up the parse and transpile caches, and checks the program runs at all
+    _, _, code, stdout, stderr = run_once(command)
+    if code or stderr:
+        raise Exception(stderr.decode().strip() or f"exited with code {code}")
+
+    runs = [run_once(command) for _ in range(repeat)]
+    times = [elapsed for elapsed, *_ in runs]
+    memory = [peak for _, peak, *_ in runs if peak is not None]
+
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "times": times,
+        "memory": max(memory) if memory else None
+    }, stdout
+
+def format_memory(size):
+    return "-" if size is None else f"{size / 2**20:.1f}MB"
+
+def compare(result, baseline, threshold):
+    if baseline is None:
+        return "", False
+
+    change = result["median"] / baseline["median"] - 1
+
+    if change > threshold:
+        return f"{change:+.1%} REGRESSION", True
+    return f"{change:+.1%}" + (" improved" if change < -threshold else ""), False
+
+def main():
+    args = arg_parser.parse_args()
+    engines = args.engine or ENGINES
+
+    names = args.names or sorted(name[:-7] for name in os.listdir(BENCHMARKS) if name.endswith(".pseudo"))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+
+    results, failed = {}, False
+
+    print(f"{'benchmark':<12} {'engine':<12} {'median':>9} {'min':>9} {'memory':>9}  vs baseline")
+
+    for name in names:
+        path = os.path.join(BENCHMARKS, name + ".pseudo")
+        results[name], expected = {}, None
+
+        for engine in engines:
+            try:
+                result, stdout = run_benchmark(path, engine, args.repeat, args.flag)
+            except Exception as e:
+                print(f"{name:<12} {engine:<12} FAILED: {e}")
+                failed = True
+                continue
+
+            # every engine has to agree on what the program outputs
+            if expected is None:
+                expected = stdout
+            elif stdout != expected:
+                print(f"{name:<12} {engine:<12} FAILED: output differs from the {engines[0]} engine")
+                failed = True
+                continue
+
+            results[name][engine] = result
+            note, regressed = compare(result, baseline.get(name, {}).get(engine), args.threshold)
+            failed |= regressed
+
+            print(f"{name:<12} {engine:<12} {result['median']:>8.3f}s {result['min']:>8.3f}s {format_memory(result['memory']):>9}  {note}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "flags": args.flag,
+                "results": results
+            }, f, indent=4)
+
+    # a non-zero exit lets scripts fail on regressions
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,68 @@
+from lark import Tree
+
+# the array builtins are plain names, called like subroutines: the node each call becomes and the arguments it takes
+FUNCTIONS = {
+    "SUM": ("array_sum", 1),
+    "MIN": ("array_min", 1),
+    "MAX": ("array_max", 1),
+    "INDEXOF": ("index_of", 2)
+}
+
+# the ones that update the array variable given first, called on a line of their own or with CALL
+PROCEDURES = {
+    "FILL": ("fill", 2),
+    "SORT": ("sort", 1),
+    "COPY": ("copy", 2)
+}
+
+BINDINGS = ["declaration", "constant", "input", "for_loop", "param", "procedure", "function"]
+
+# names the program binds anywhere, as a variable, constant, parameter or subroutine
+def bound(tree):
+    names = set()
+
+    for node in tree.iter_subtrees():
+        if node.data in BINDINGS:
+            names.add(str(node.children[0]))
+
+    return names
+
+# turns the calls of builtins into their nodes, unless the program binds the name itself.
+# a program using SUM or MAX for something of its own keeps it, and calls to that name resolve to what it defined
+def resolve_builtins(tree):
+    names = bound(tree)
+
+    for node in list(tree.iter_subtrees()):
+        if node.data == "call_function":
+            resolve_function(node, names)
+        elif node.data == "statement" and getattr(node.children[0], "data", None) == "call_function":
+            resolve_procedure(node, node.children[0].children[0], node.children[0].children[1].children, names)
+        elif node.data == "call_procedure" and isinstance(node.children[1], Tree):
+            resolve_procedure(node, node.children[0], node.children[1].children, names)
+
+    return tree
+
+def resolve_function(node, names):
+    name, args = str(node.children[0]), node.children[1].children
+
+    if name in names or name not in FUNCTIONS:
+        return
+
+    data, arity = FUNCTIONS[name]
+
+    if len(args) == arity:
+        node.data, node.children = data, args
+
+def resolve_procedure(node, name, args, names):
+    name = str(name)
+
+    if name in names or name not in PROCEDURES:
+        return
+
+    data, arity = PROCEDURES[name]
+
+    # the array has to be a variable, which is rebound to the updated array
+    if len(args) != arity or args[0].data != "var":
+        return
+
+    node.data, node.children = data, [args[0].children[0], *args[1:], node.children[-1]]
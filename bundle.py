@@ -7,16 +7,24 @@ for i, arg in enumerate(sys.argv[1:], start=1):
 
 root = os.path.dirname(os.path.abspath(__file__))
 file = args[0]
-exec = [f"{root}\\{file}.exe", f"{root}\\{args[1]}.exe"]
+target = f"{root}\\{args[1]}"
 
 def main():
-    for i in exec:
-        if os.path.exists(i): os.remove(i)
+    if os.path.isdir(target): shutil.rmtree(target)
 
-    subprocess.call(["pyinstaller", "--onefile", f"{file}.py", "-i", "NONE"])
+    # onedir starts straight from disk instead of unpacking itself to a temp folder on every run,
+    # engines are imported by name so they have to be listed explicitly
+    subprocess.call(["pyinstaller", "--onedir", f"{file}.py", "-i", "NONE", "--hidden-import", "compiler", "--hidden-import", "transpiler"])
     
-    shutil.move(f"{root}\\dist\\{file}.exe", root)
-    os.rename(exec[0], exec[1])
+    shutil.move(f"{root}\\dist\\{file}", target)
+    os.rename(f"{target}\\{file}.exe", f"{target}\\{args[1]}.exe")
+
+    # ship the grammar together with its serialized parser tables
+    from pseudo import get_parser
+    get_parser()
+
+    for i in ["syntax.lark", "syntax.lark.cache"]:
+        shutil.copy(f"{root}\\{i}", target)
     
     for i in ["build", "dist", "__pycache__"]:
         if (os.path.exists(f"{root}\\{i}")): 
@@ -0,0 +1,68 @@
+import os
+import pickle
+import hashlib
+from lark import __version__ as LARK_VERSION
+
+CACHE_DIR = "__pseudocache__"
+
+# total size of the cached trees, least recently used ones are evicted past it
+MAX_SIZE = 32 * 1024 * 1024
+
+EXT = ".ast"
+
+# trees are keyed by the normalized program and the grammar (and lark) that parsed it
+def tree_path(root, grammar, program):
+    digest = hashlib.sha256(f"{LARK_VERSION}\n{grammar}\n{program}".encode()).hexdigest()[:32]
+    return os.path.join(root, CACHE_DIR, digest + EXT)
+
+def load_tree(path):
+    try:
+        with open(path, "rb") as f:
+            tree = pickle.load(f)
+    except Exception:
+        # missing or unreadable entries are just parsed again
+        return None
+
+    try:
+        # the modification time doubles as the last use time
+        os.utime(path)
+    except OSError:
+        pass
+
+    return tree
+
+def save_tree(path, tree):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write under a temporary name so concurrent runs never read a partial entry
+        temp = f"{path}.{os.getpid()}"
+        with open(temp, "wb") as f:
+            pickle.dump(tree, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+
+        evict(os.path.dirname(path))
+    except OSError:
+        pass
+
+def evict(folder, max_size=MAX_SIZE):
+    entries = []
+
+    for name in os.listdir(folder):
+        if name.endswith(EXT):
+            try:
+                stat = os.stat(os.path.join(folder, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = 0
+
+    for _, size, name in sorted(entries, reverse=True):
+        total += size
+
+        if total > max_size:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
\ No newline at end of file
@@ -0,0 +1,539 @@
+import operator
+from compiler import *
+
+# error found before the program runs, tagged with the line it is on
+class CheckError(Exception):
+    def __init__(self, error, line):
+        super().__init__(error)
+        self.error, self.line = error, line
+
+SAMPLES = {
+    "INTEGER": 2,
+    "REAL": 2.0,
+    "BOOLEAN": True,
+    "STRING": "a",
+    "CHAR": PChar("a")
+}
+
+# static type of `a op b`, None if it can only be decided at runtime, False if it always fails
+def result_type(op, a, b):
+    if a not in SAMPLES or b not in SAMPLES or (op is operator.mod and a == "STRING"):
+        return None
+
+    try:
+        return get_type(op(SAMPLES[a], SAMPLES[b]))
+    except TypeError:
+        return False
+
+def element_type(type, dimensions):
+    for _ in range(dimensions):
+        if not (type or "").startswith("ARRAY<"):
+            return None
+        type = type[6:-1]
+    return type
+
+# a lexical scope of the program
+class Block:
+    def __init__(self, parent, kind, names=()):
+        # kind is "global", "function", "loop" or "block"
+        self.parent, self.kind = parent, kind
+
+        self.names = set(names)
+        self.bindings = {}
+
+        # binding of the subroutine a "function" scope belongs to
+        self.subroutine = None
+
+# what a name is statically known to be, a None kind if it depends on the path taken to it
+class Symbol:
+    def __init__(self, kind, type, params=None):
+        # kind is "var", "const", "array", "procedure" or "function"
+        self.kind, self.type, self.params = kind, type, params
+
+UNKNOWN = Symbol(None, None)
+
+COMPOUND = ["conditional", "switch", "while_loop", "repeat_until", "for_loop", "procedure", "function"]
+
+# names a statement declares in the scope it runs in
+def declared(stmt):
+    if isinstance(stmt, Token):
+        return []
+
+    if stmt.data == "statement" and stmt.children[0].data in ["declaration", "constant"]:
+        return [str(stmt.children[0].children[0])]
+    if stmt.data == "input":
+        return [str(stmt.children[0])]
+    if stmt.data in ["procedure", "function"]:
+        return [str(stmt.children[0].children[0])]
+    return []
+
+# statement lists nested directly inside a statement, with the names they declare up front
+def nested(stmt):
+    if isinstance(stmt, Token) or stmt.data not in COMPOUND:
+        return []
+
+    node = stmt.children[0]
+
+    if node.data == "conditional":
+        return [(branch.children[1:], []) for branch in node.children]
+    if node.data == "switch":
+        return [(branch.children[-1:], []) for branch in node.children[1:] if isinstance(branch, Tree)]
+    if node.data == "for_loop":
+        return [(node.children[1:], [str(node.children[0])])]
+    if node.data in ["procedure", "function"]:
+        params = node.children[1]
+        names = [str(param.children[0]) for param in params.children] if isinstance(params, Tree) and params.data == "param_list" else []
+        return [(node.children[1:], names)]
+    return [(node.children, [])]
+
+# infers the types of the program before it runs, reporting the type errors it is certain of
+# and collecting the nodes whose runtime type checks are known to pass
+class Checker:
+    def __init__(self, file, code):
+        self.runtime = Interpreter(file, code, True)
+
+    def check(self, tree):
+        # ids of the assignments, calls and functions that can skip their type checks
+        self.checked = set()
+
+        # names that are not always the same global when a subroutine resolves them through its caller
+        self.nonglobal, self.top = set(), {}
+
+        for stmt in tree.children:
+            self.collect(stmt)
+
+            for name in declared(stmt):
+                if name in self.top:
+                    self.nonglobal.add(name)
+                self.top[name] = stmt
+
+        self.globals = self.block = Block(None, "global", self.top)
+        self.statements(tree.children)
+
+        return self.checked
+
+    def fail(self, tree, error):
+        raise CheckError(error, tree.meta.line)
+
+    def collect(self, stmt):
+        for stmts, names in nested(stmt):
+            self.nonglobal.update(names)
+
+            for child in stmts:
+                self.nonglobal.update(declared(child))
+                self.collect(child)
+
+    # scopes
+    def enter(self, kind, stmts=(), names=()):
+        self.block = Block(self.block, kind, [*names, *(name for stmt in stmts for name in declared(stmt))])
+
+    def leave(self):
+        self.block = self.block.parent
+
+    def declare(self, name, symbol, block=None):
+        block = block or self.block
+        current = block.bindings.get(name)
+
+        # redeclaring a name as something else leaves it up to the runtime
+        if current is not None and vars(current) != vars(symbol):
+            symbol = UNKNOWN
+
+        block.bindings[name] = symbol
+        return symbol
+
+    def resolve(self, name):
+        block = self.block
+
+        while block:
+            if name in block.bindings:
+                return block.bindings[name]
+
+            # declared further down a loop body, so it only shadows the outer name from the second iteration on
+            if block.kind == "loop" and name in block.names:
+                return UNKNOWN
+
+            if block.kind == "function":
+                # subroutines see their caller's variables, which are only known statically for globals
+                if name in self.nonglobal:
+                    return UNKNOWN
+
+                if name in self.globals.bindings:
+                    return self.globals.bindings[name]
+
+                return self.predeclare(name) if name in self.top else UNKNOWN
+
+            block = block.parent
+
+        return UNKNOWN
+
+    # whether a name is bound in the frame of the subroutine being checked (or the global one)
+    def local(self, name):
+        block = self.block
+
+        while block.kind not in ["function", "global"]:
+            if name in block.bindings:
+                return True
+            if block.kind == "loop" and name in block.names:
+                return False
+            block = block.parent
+
+        return name in block.bindings
+
+    # called with every variable the program reads or writes, for subclasses tracking what the code touches
+    def access(self, name):
+        pass
+
+    # binds a global that a subroutine uses before its declaration is reached
+    def predeclare(self, name):
+        stmt = self.top[name]
+
+        if stmt.data == "input":
+            return self.declare(name, Symbol("var", "STRING"), self.globals)
+
+        node = stmt.children[0]
+
+        if node.data == "declaration":
+            return self.declare(name, self.declaration_type(node), self.globals)
+        if node.data in ["procedure", "function"]:
+            return self.declare(name, self.signature(node), self.globals)
+
+        value = node.children[1]
+        if value.data not in ["number", "string", "boolean", "char"]:
+            return UNKNOWN
+        return self.declare(name, Symbol("const", get_type(self.runtime.visit(value))), self.globals)
+
+    def declaration_type(self, node):
+        block = node.children[1]
+
+        if not hasattr(block, "data"):
+            return Symbol("var", str(block))
+        return Symbol("array", "ARRAY<" * len(block.children[:-1]) + str(block.children[-1]) + ">" * len(block.children[:-1]))
+
+    def signature(self, node):
+        block = node.children
+
+        try:
+            params, offset = self.runtime.get_params(block[1])
+        except AssertionError as e:
+            self.fail(node, str(e))
+
+        params = [(name, param.get_type()) for name, param in params.items()]
+
+        if node.data == "procedure":
+            return Symbol("procedure", None, params)
+        return Symbol("function", self.runtime.get_param(block[offset]).get_type(), params)
+
+    # statements
+    def statements(self, stmts):
+        for stmt in stmts:
+            if not self.runtime.check_newline(stmt):
+                self.statement(stmt)
+
+    def statement(self, stmt):
+        if stmt.data in COMPOUND:
+            getattr(self, "stmt_" + stmt.data)(stmt)
+        elif stmt.data != "statement":
+            getattr(self, "stmt_" + stmt.data)(stmt)
+        elif stmt.children[0].data in ["declaration", "constant", "assignment", "index_assignment"]:
+            getattr(self, "stmt_" + stmt.children[0].data)(stmt.children[0])
+        else:
+            self.expr(stmt.children[0])
+
+    def stmt_declaration(self, node):
+        block = node.children[1]
+
+        if hasattr(block, "data"):
+            for bounds in block.children[:-1]:
+                for bound in bounds.children:
+                    self.expr(bound)
+
+        self.declare(str(node.children[0]), self.declaration_type(node))
+
+    def stmt_constant(self, node):
+        self.declare(str(node.children[0]), Symbol("const", self.expr(node.children[1])))
+
+    def stmt_assignment(self, node):
+        name, type = str(node.children[0]), self.expr(node.children[1])
+        symbol = self.resolve(name)
+        self.access(name)
+
+        if symbol.kind == "array":
+            self.fail(node, f'Cannot assign to "{symbol.type}"')
+        if symbol.kind == "const":
+            self.fail(node, f'Cannot assign to constant "{name}"')
+
+        if symbol.kind == "var" and type is not None:
+            if type != symbol.type:
+                self.fail(node, f'Assignment type mismatch, expected "{symbol.type}", got "{type}"')
+
+            self.checked.add(id(node))
+
+    def stmt_index_assignment(self, node):
+        name = str(node.children[0])
+        indices = node.children[1].children
+
+        for index in indices:
+            self.expr(index)
+
+        type, symbol = self.expr(node.children[2]), self.resolve(name)
+        self.access(name)
+
+        if symbol.kind in ["var", "const"] and symbol.type is not None:
+            self.fail(node, f'Cannot apply index assignment to "{symbol.type}"')
+
+        if symbol.kind != "array":
+            return
+
+        dimensions = symbol.type.count("ARRAY<")
+
+        if len(indices) < dimensions:
+            self.fail(node, f'Cannot assign to "{element_type(symbol.type, 1)}"')
+        if len(indices) > dimensions:
+            self.fail(node, f'Cannot apply 2D indexing to "{symbol.type}"')
+
+        element = element_type(symbol.type, len(indices))
+
+        if type is not None:
+            if type != element:
+                self.fail(node, f'Assignment type mismatch, expected "{element}", got "{type}"')
+
+            self.checked.add(id(node))
+
+    def stmt_array_update(self, stmt):
+        self.access(str(stmt.children[0]))
+
+        for child in stmt.children[1:]:
+            if not self.runtime.check_newline(child):
+                self.expr(child)
+
+    stmt_fill = stmt_sort = stmt_copy = stmt_array_update
+
+    def stmt_output(self, stmt):
+        for child in stmt.children:
+            if not self.runtime.check_newline(child):
+                self.expr(child)
+
+    def stmt_input(self, stmt):
+        self.declare(str(stmt.children[0]), Symbol("var", "STRING"))
+
+    def stmt_conditional(self, stmt):
+        for branch in stmt.children[0].children:
+            if branch.data != "else_branch":
+                self.expr(branch.children[0])
+
+            self.body("block", branch.children[1:])
+
+    def stmt_switch(self, stmt):
+        node = stmt.children[0]
+        self.access(str(node.children[0]))
+
+        for branch in node.children[1:]:
+            if self.runtime.check_newline(branch):
+                continue
+
+            if branch.data == "otherwise_branch":
+                self.body("block", branch.children)
+            else:
+                self.expr(branch.children[0])
+                self.body("block", branch.children[1:])
+
+    def body(self, kind, stmts, names=()):
+        self.enter(kind, stmts, names)
+        self.statements(stmts)
+        self.leave()
+
+    def stmt_while_loop(self, stmt):
+        node = stmt.children[0]
+
+        self.enter("loop", node.children[1:])
+        self.expr(node.children[0])
+        self.statements(node.children[1:])
+        self.leave()
+
+    def stmt_repeat_until(self, stmt):
+        block = [line for line in stmt.children[0].children if not self.runtime.check_newline(line)]
+
+        self.enter("loop", block[:-1])
+        self.statements(block[:-1])
+        self.expr(block[-1])
+        self.leave()
+
+    def stmt_for_loop(self, stmt):
+        block = stmt.children[0].children
+        is_step = getattr(block[3], "data", None) == "step"
+
+        for bound in block[1:3] + (block[3].children if is_step else []):
+            self.expr(bound)
+
+        body = block[4:] if is_step else block[3:]
+
+        self.enter("loop", body, [str(block[0])])
+        self.declare(str(block[0]), Symbol("var", "INTEGER"))
+        self.loop_body(stmt, body)
+        self.leave()
+
+    # the statements of a FOR loop, in the scope its iterator is declared in
+    def loop_body(self, stmt, body):
+        self.statements(body)
+
+    def stmt_procedure(self, stmt):
+        self.define(stmt)
+
+    def stmt_function(self, stmt):
+        self.define(stmt)
+
+    def define(self, stmt):
+        node = stmt.children[0]
+        block = node.children
+
+        symbol = self.declare(str(block[0]), self.signature(node))
+        offset = 2 if isinstance(block[1], Tree) and block[1].data == "param_list" else 1
+        body = block[offset + (node.data == "function"):]
+
+        outer, self.returns = getattr(self, "returns", True), True
+
+        self.enter("function", body, [name for name, _ in symbol.params or []])
+        self.block.subroutine = symbol
+
+        for name, type in symbol.params or []:
+            self.declare(name, Symbol("array" if type.startswith("ARRAY") else "var", type))
+
+        self.statements(body)
+        self.leave()
+
+        # every RETURN in the body gives the declared type, so calls need not check what comes back
+        if symbol.kind == "function" and self.returns:
+            self.checked.add(id(stmt))
+
+        self.returns = outer
+
+    def subroutine(self):
+        block = self.block
+
+        while block and block.kind != "function":
+            block = block.parent
+        return block and block.subroutine
+
+    # a RETURN of the wrong type is left to the runtime check, which reports it at the line of the call
+    def stmt_return_stmt(self, stmt):
+        type, function = self.expr(stmt.children[0]), self.subroutine()
+
+        if function is None or function.kind != "function":
+            return
+
+        if type != function.type:
+            self.returns = False
+
+    def stmt_call_procedure(self, stmt):
+        args = stmt.children[1].children if len([i for i in stmt.children if not self.runtime.check_newline(i)]) > 1 else []
+        self.call(stmt, args, "procedure")
+
+    def call(self, tree, args, kind):
+        types = [*map(self.expr, args)]
+        symbol = self.resolve(str(tree.children[0]))
+
+        if symbol.kind not in ["procedure", "function"]:
+            return None
+
+        if kind == "procedure" and symbol.kind == "function":
+            self.fail(tree, 'Cannot "CALL" Function, directly invoke instead')
+        if kind == "function" and symbol.kind == "procedure":
+            self.fail(tree, f'Cannot directly invoke Procedure "{tree.children[0]}", use "CALL"')
+        if len(args) != len(symbol.params):
+            self.fail(tree, f"Expected {len(symbol.params)} arguments, got {len(args)}")
+
+        for type, (_, param) in zip(types, symbol.params):
+            if type is not None and type != param:
+                self.fail(tree, f'Expected "{param}" argument type, got "{type}"')
+
+        if None not in types:
+            self.checked.add(id(tree))
+
+        return symbol.type
+
+    # expressions, as their static type (None when it is only known at runtime)
+    def expr(self, tree):
+        return getattr(self, "expr_" + tree.data)(tree)
+
+    def expr_number(self, tree):
+        return get_type(self.runtime.visit(tree))
+
+    def expr_string(self, tree):
+        return "STRING"
+
+    def expr_boolean(self, tree):
+        return "BOOLEAN"
+
+    def expr_char(self, tree):
+        return "CHAR"
+
+    def expr_var(self, tree):
+        symbol = self.resolve(str(tree.children[0]))
+        self.access(str(tree.children[0]))
+        return symbol.type if symbol.kind in ["var", "const", "array"] else None
+
+    def expr_binary(self, tree):
+        a, b = map(self.expr, tree.children)
+        type = result_type(OPERATORS[tree.data], a, b)
+
+        if type is False:
+            self.fail(tree, f'Operation not supported between "{a}" and "{b}"')
+        return type
+
+    expr_add = expr_sub = expr_mul = expr_div = expr_mod = expr_binary
+    expr_gt = expr_lt = expr_gte = expr_lte = expr_eq = expr_neq = expr_binary
+
+    def expr_neg(self, tree):
+        type = self.expr(tree.children[0])
+
+        if type in ["INTEGER", "REAL", "BOOLEAN"]:
+            return "REAL" if type == "REAL" else "INTEGER"
+
+    def expr_not_op(self, tree):
+        self.expr(tree.children[0])
+        return "BOOLEAN"
+
+    def expr_logical(self, tree):
+        a, b = map(self.expr, tree.children)
+        return a if a == b else None
+
+    expr_and_op = expr_or_op = expr_logical
+
+    def expr_get_index(self, tree):
+        type = self.expr(tree.children[0])
+        indices = tree.children[1].children
+
+        for index in indices:
+            self.expr(index)
+
+        if type == "STRING" and len(indices) == 1:
+            return "STRING"
+        return element_type(type, len(indices))
+
+    def expr_length(self, tree):
+        self.expr(tree.children[0])
+        return "INTEGER"
+
+    def expr_array_builtin(self, tree):
+        type = self.expr(tree.children[0])
+        element = element_type(type, 1)
+
+        if element and element.startswith("ARRAY<"):
+            element = element_type(element, 1)
+        if tree.data == "array_sum" and element not in ["INTEGER", "REAL"]:
+            return None
+        return element
+
+    expr_array_sum = expr_array_min = expr_array_max = expr_array_builtin
+
+    def expr_index_of(self, tree):
+        for child in tree.children:
+            self.expr(child)
+        return "INTEGER"
+
+    def expr_type_cast(self, tree):
+        self.expr(tree.children[1])
+        return str(tree.children[0])
+
+    def expr_call_function(self, tree):
+        return self.call(tree, tree.children[1].children, "function")
\ No newline at end of file
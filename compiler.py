@@ -0,0 +1,714 @@
+import sys
+import operator
+from interpreter import *
+
+# error raised by compiled code, tagged with the line of the statement that failed
+class PseudoError(Exception):
+    def __init__(self, error, line):
+        super().__init__(error)
+        self.error, self.line = error, line
+
+def locate(error, line):
+    return error if isinstance(error, PseudoError) else PseudoError(error, line)
+
+OPERATORS = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "div": operator.truediv,
+    "mod": operator.mod,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "gte": operator.ge,
+    "lte": operator.le,
+    "eq": operator.eq,
+    "neq": operator.ne
+}
+
+def resolve(cell, name, error="Variable"):
+    # reads a name through the cell it was resolved to at compile time
+    def get():
+        try:
+            return cell[-1].value
+        except IndexError:
+            raise Exception(f'{error} "{name}" is not defined') from None
+        except AttributeError:
+            return cell[-1]
+    return get
+
+# turns the parse tree into nested closures once, then runs them
+class Compiler:
+    def __init__(self, file, code, no_newlines, max_depth=None, out=None, inp=None, profiler=None, checked=None, memo=None, limits=None, parallel=None):
+        self.file, self.code = file, code
+        self.profiler = profiler
+        self.memo = memo
+        self.limits = limits
+        self.parallel = parallel
+
+        # compiled code runs against the same runtime state and helpers as the tree walker
+        self.runtime = Interpreter(file, code, no_newlines, max_depth, out, inp, checked=checked, limits=limits)
+        self.checked = self.runtime.checked
+        self.scope, self.call_stack, self.out = self.runtime.scope, self.runtime.call_stack, self.runtime.out
+
+        # the value of each hoisted expression, shared with the loop it was hoisted out of
+        self.slots = {}
+
+    def visit(self, tree):
+        program = self.compile(tree)
+
+        try:
+            program()
+        except PseudoError as e:
+            raise ProgramExit(self.file, e.line, e.error, self.code)
+
+    def compile(self, tree):
+        return getattr(self, tree.data)(tree)
+
+    def located(self, tree):
+        run, line = self.compile(tree), tree.meta.line
+
+        def wrapper():
+            try:
+                return run()
+            except Exception as e:
+                raise locate(e, line) from None
+        return wrapper
+
+    def block(self, stmts):
+        stmts = [(self.compile(stmt), stmt.meta.line) for stmt in stmts if not self.runtime.check_newline(stmt)]
+
+        # statements are only wrapped in timing code when profiling
+        if self.profiler is not None:
+            stmts = [(self.profiler.timed(stmt, line), line) for stmt, line in stmts]
+
+        # a statement gives back True when it ran a RETURN, which stops the ones after it
+        def run():
+            for stmt, line in stmts:
+                try:
+                    if stmt():
+                        return True
+                except Exception as e:
+                    raise locate(e, line) from None
+        return run
+
+    def scoped(self, run):
+        add_scope, remove_scope = self.scope.add_scope, self.scope.remove_scope
+
+        def wrapper():
+            add_scope()
+
+            try:
+                return run()
+            finally:
+                remove_scope()
+        return wrapper
+
+    # every run of a loop body is a step, only counted when there is a cap on them
+    def counted(self, body):
+        if self.limits is None or not self.limits.max_steps:
+            return body
+
+        step = self.limits.step
+
+        def run():
+            step()
+            return body()
+        return run
+
+    def slot(self, tree):
+        return self.slots.setdefault(id(tree), [UNSET])
+
+    # a loop clears the values of its hoisted expressions when it starts, and puts back
+    # those of any run of it that is still going (further up a recursion) when it ends
+    def hoisting(self, tree, run):
+        slots = [self.slot(node) for node in getattr(tree.meta, "hoisted", ())]
+
+        if not slots:
+            return run
+
+        def wrapper():
+            saved = [slot[0] for slot in slots]
+
+            for slot in slots:
+                slot[0] = UNSET
+
+            try:
+                return run()
+            finally:
+                for slot, value in zip(slots, saved):
+                    slot[0] = value
+        return wrapper
+
+    def start(self, tree):
+        return self.block(tree.children)
+
+    def statement(self, tree):
+        run = self.compile(tree.children[0])
+
+        if tree.children[0].data in ["declaration", "index_assignment", "assignment", "constant"]:
+            return run
+
+        # the value of an expression used as a statement is dropped
+        def discard():
+            run()
+        return discard
+
+    # data types
+    def constant_value(self, tree):
+        value = self.runtime.visit(tree)
+        return lambda: value
+
+    number = string = boolean = char = constant_value
+
+    # operators
+    def binary_op(self, tree):
+        op, a, b = OPERATORS[tree.data], *map(self.compile, tree.children)
+
+        def run():
+            x, y = a(), b()
+
+            try:
+                return op(x, y)
+            except TypeError:
+                raise operation_error(x, y)
+        return run
+
+    add = sub = mul = div = mod = gt = lt = gte = lte = eq = neq = binary_op
+
+    def neg(self, tree):
+        a = self.compile(tree.children[0])
+
+        def run():
+            x = a()
+
+            try:
+                return -x
+            except TypeError:
+                raise operation_error(x)
+        return run
+
+    def not_op(self, tree):
+        a = self.compile(tree.children[0])
+        return lambda: not a()
+
+    def and_op(self, tree):
+        a, b = map(self.compile, tree.children)
+        return lambda: a() and b()
+
+    def or_op(self, tree):
+        a, b = map(self.compile, tree.children)
+        return lambda: a() or b()
+
+    # variables
+    def var(self, tree):
+        name = str(tree.children[0])
+        return resolve(self.scope.cell(name), name)
+
+    def declaration(self, tree):
+        name, block = str(tree.children[0]), tree.children[1]
+        define = self.scope.define
+
+        if not hasattr(block, "data"):
+            type = TYPES[block]
+            return lambda: define(name, Variable(type, type.default, True))
+
+        bounds = [[*map(self.compile, bounds.children)] for bounds in block.children[:-1]]
+        type = block.children[-1]
+        array = Array if self.limits is None else self.limits.array
+
+        def run():
+            dimensions = []
+
+            for l, u in bounds:
+                l, u = l(), u()
+
+                assert isinstance(l, int) and isinstance(u, int), "Array indices must be integers"
+                assert u >= l, "Invalid array bounds"
+                assert l == 1, "Array must be 1-indexed"
+
+                dimensions.append((l, u))
+
+            define(name, Variable(TYPES["ARRAY"], array(str(type), tuple(u for _, u in dimensions)), True, type))
+        return run
+
+    def constant(self, tree):
+        name, value, define = str(tree.children[0]), self.compile(tree.children[1]), self.scope.define
+
+        def run():
+            v = value()
+            define(name, Variable(TYPES[get_type(v)], v, False))
+        return run
+
+    def assignment(self, tree):
+        if tree.children[1].data == "add" and getattr(tree.meta, "append", False):
+            return self.append(tree)
+
+        name, value = str(tree.children[0]), self.compile(tree.children[1])
+        cell, store = self.scope.cell(name), self.scope.store
+
+        if id(tree) in self.checked:
+            def run():
+                v = value()
+
+                if not cell:
+                    raise Exception(f'Variable "{name}" is not declared')
+
+                cell[-1].value = v
+            return run
+
+        def run():
+            v = value()
+
+            if not cell:
+                raise Exception(f'Variable "{name}" is not declared')
+
+            store(cell[-1], name, v)
+        return run
+
+    # appends to a STRING in place, see Interpreter.append
+    def append(self, tree):
+        name, text = str(tree.children[0]), self.compile(tree.children[1].children[1])
+        cell, append = self.scope.cell(name), self.runtime.append
+
+        def run():
+            if not cell:
+                raise Exception(f'Variable "{name}" is not defined')
+
+            append(name, text())
+        return run
+
+    def index_assignment(self, tree):
+        name, index, value = str(tree.children[0]), *map(self.compile, tree.children[1:])
+        cell, check_indices, store_index = self.scope.cell(name), self.runtime.check_indices, self.scope.store_index
+        get = resolve(cell, name)
+
+        if id(tree) in self.checked:
+            def run():
+                indices, v = index(), value()
+
+                check_indices(get(), indices)
+
+                store_index(cell[-1], [i - 1 for i in indices], v)
+            return run
+
+        def run():
+            indices, v = index(), value()
+
+            var = get()
+
+            assert isinstance(var, Array), f'Cannot apply index assignment to "{get_type(var)}"'
+
+            if len(indices) == 1 and len(var.shape) > 1:
+                raise Exception(f'Cannot assign to "{type_repr("ARRAY", var.type)}"')
+
+            if len(indices) > 1 and len(var.shape) == 1:
+                raise Exception(f'Cannot apply 2D indexing to "{get_type(var)}"')
+
+            assert type(v) == TYPES[var.type].bind, f'Assignment type mismatch, expected "{var.type}", got "{get_type(v)}"'
+
+            check_indices(var, indices)
+
+            store_index(cell[-1], [i - 1 for i in indices], v)
+        return run
+
+    # loop invariants
+    def hoisted(self, tree):
+        value, slot = self.compile(tree.children[0]), self.slot(tree)
+
+        def run():
+            v = slot[0]
+
+            if v is UNSET:
+                v = slot[0] = value()
+            return v
+        return run
+
+    # indexing
+    def index(self, tree):
+        values = [*map(self.compile, tree.children)]
+        return lambda: [value() for value in values]
+
+    def get_index(self, tree):
+        collection, index = map(self.compile, tree.children)
+        check_indices = self.runtime.check_indices
+
+        def run():
+            value, indices = collection(), index()
+
+            assert type(value) in [str, Array], f'Cannot apply indexing to "{get_type(value)}"'
+
+            if len(indices) > 1 and (type(value) is str or len(value.shape) == 1):
+                raise Exception(f'Cannot apply 2D indexing to "{get_type(value)}"')
+
+            check_indices(value, indices)
+
+            return value.get((indices[0] - 1) * value.shape[1] + indices[1] - 1) if len(indices) > 1 else value[indices[0] - 1]
+        return run
+
+    # i/o
+    def output(self, tree):
+        values = [self.compile(child) for child in tree.children if not self.runtime.check_newline(child)]
+        end = "" if self.runtime.no_newlines else "\n"
+
+        output = self.out.output
+
+        def run():
+            output([value() for value in values], end)
+        return run
+
+    def input(self, tree):
+        name, define, read_line = str(tree.children[0]), self.scope.define, self.runtime.read_line
+        return lambda: define(name, Variable(TYPES["STRING"], read_line(), True))
+
+    # conditionals
+    def conditional(self, tree):
+        branches = []
+
+        for branch in tree.children[0].children:
+            if "if_branch" in branch.data:
+                condition = self.compile(branch.children[0]) if branch.data == "if_branch" else self.located(branch.children[0])
+            else:
+                condition = None
+
+            branches.append((condition, self.block(branch.children[1:])))
+
+        def run():
+            for condition, body in branches:
+                if condition is None or condition():
+                    return body()
+        return self.scoped(run)
+
+    def switch(self, tree):
+        block = tree.children[0].children
+
+        identifier = str(block[0])
+        get = resolve(self.scope.cell(identifier), identifier)
+        branches = []
+
+        for branch in block[1:]:
+            if self.runtime.check_newline(branch):
+                continue
+
+            if branch.data == "otherwise_branch":
+                branches.append((None, self.block(branch.children)))
+                break
+
+            branches.append((self.located(branch.children[0]), self.block(branch.children[1:])))
+
+        def run():
+            for condition, body in branches:
+                if condition is None or condition() == get():
+                    return body()
+        return self.scoped(run)
+
+    # loops
+    def while_loop(self, tree):
+        block = tree.children[0].children
+        condition, body = self.compile(block[0]), self.counted(self.block(block[1:]))
+
+        def run():
+            while condition():
+                if body():
+                    return True
+        return self.hoisting(tree.children[0], self.scoped(run))
+
+    def repeat_until(self, tree):
+        block = [line for line in tree.children[0].children if not self.runtime.check_newline(line)]
+        body, condition = self.counted(self.block(block[:-1])), self.located(block[-1])
+
+        def run():
+            if body():
+                return True
+
+            while not condition():
+                if body():
+                    return True
+        return self.hoisting(tree.children[0], self.scoped(run))
+
+    def step(self, tree):
+        return self.compile(tree.children[0])
+
+    def for_loop(self, tree):
+        block = tree.children[0].children
+
+        is_step = getattr(block[3], "data", None) == 'step'
+
+        iterator, start, stop = str(block[0]), self.compile(block[1]), self.compile(block[2])
+        step = self.compile(block[3]) if is_step else lambda: 1
+        iterate = self.iterate(iterator, self.counted(self.block(block[4:] if is_step else block[3:])))
+        parallel = self.parallel if self.parallel is not None and id(tree) in self.parallel.loops else None
+
+        def run():
+            s = step()
+            first, last = start(), stop() + (-1 if s < 0 else 1)
+
+            assert s != 0, "Iteration step cannot be 0"
+            assert all(isinstance(i, int) for i in (first, last, s)), "Iteration bounds must be integers"
+
+            if parallel is not None:
+                return parallel.run(self, tree, range(first, last, s), iterate)
+
+            return iterate(range(first, last, s))
+        return self.hoisting(tree.children[0], self.scoped(run))
+
+    # runs a loop body once for each value of its iterator
+    def iterate(self, iterator, body):
+        define, cell = self.scope.define, self.scope.cell(iterator)
+
+        def run(iterations):
+            var = Variable(TYPES['INTEGER'], iterations.start, True)
+            define(iterator, var)
+
+            for i in iterations:
+                # unless the body redeclared the iterator, it is still the variable defined above
+                if cell[-1] is var:
+                    var.value = i
+                else:
+                    self.scope.assign(iterator, i)
+
+                if body():
+                    return True
+        return run
+
+    # runs some of the iterations of a FOR loop, the part of it a worker process was given
+    def run_loop(self, tree, iterations):
+        block = tree.children[0].children
+        is_step = getattr(block[3], "data", None) == 'step'
+
+        return self.iterate(str(block[0]), self.block(block[4:] if is_step else block[3:]))(iterations)
+
+    # subroutines
+    def set_args(self, params, args, checked=False):
+        assert len(params) == len(args), f"Expected {len(params)} arguments, got {len(args)}"
+
+        # arguments are evaluated in the caller's scope
+        args = [arg() for arg in args]
+
+        self.runtime.push_frame()
+        self.bind(params, args, checked)
+
+        return args
+
+    # defines the parameters in the frame of the call
+    def bind(self, params, args, checked):
+        for (name, param), arg in zip(params, args):
+            # pass arrays by value, storage is only copied once either side writes to it
+            if isinstance(arg, Array):
+                arg = arg.share()
+
+            if not checked:
+                param_type = param.get_type()
+                assert get_type(arg) == param_type, f'Expected "{param_type}" argument type, got "{get_type(arg)}"'
+
+            self.scope.define(name, Variable(TYPES[param.type.name], arg, True))
+
+    def procedure(self, tree):
+        block = tree.children[0].children
+
+        name, define = str(block[0]), self.scope.define
+        offset = 2 if isinstance(block[1], Tree) and block[1].data == "param_list" else 1
+        code = self.block(block[offset:])
+
+        def run():
+            params, _ = self.runtime.get_params(block[1])
+            define(name, Procedure(params, code))
+        return run
+
+    def call_procedure(self, tree):
+        name = str(tree.children[0])
+        get = resolve(self.scope.cell(name), name, "Procedure")
+        args = [*map(self.compile, tree.children[1].children)] if len([i for i in tree.children if not self.runtime.check_newline(i)]) > 1 else []
+        checked = id(tree) in self.checked
+
+        def run():
+            proc = get()
+
+            assert not isinstance(proc, Function), f'Cannot "CALL" Function, directly invoke instead'
+
+            self.set_args([*proc.params.items()], args, checked)
+            self.call_stack.append(proc)
+
+            proc.code()
+
+            self.runtime.pop_frame()
+            self.call_stack.pop()
+        return run if self.profiler is None else self.profiler.timed(run, name=name)
+
+    def function(self, tree):
+        block = tree.children[0].children
+
+        name, define = str(block[0]), self.scope.define
+        offset = 2 if isinstance(block[1], Tree) and block[1].data == "param_list" else 1
+        code = self.block(block[offset + 1:])
+        checked = id(tree) in self.checked
+        cache = None if self.memo is None else self.memo.cache(tree)
+
+        def run():
+            params, body = self.runtime.get_params(block[1])
+            define(name, Function(self.runtime.get_param(block[body]), params, code, checked, cache))
+        return run
+
+    def call_function(self, tree):
+        name = str(tree.children[0])
+        get = resolve(self.scope.cell(name), name, "Function")
+        args = [*map(self.compile, tree.children[1].children)]
+        checked = id(tree) in self.checked
+        runtime, scope = self.runtime, self.scope
+
+        def run():
+            func = get()
+
+            assert isinstance(func, Function), f'Cannot directly invoke Procedure "{name}", use "CALL"'
+
+            params = [*func.params.items()]
+            values = self.set_args(params, args, checked)
+            self.call_stack.append(func)
+
+            # a pure function called with the same arguments before gives back the same result
+            if func.cache is not None:
+                key, value = func.cache.get(values)
+
+                if value is not UNSET:
+                    runtime.pop_frame()
+                    self.call_stack.pop()
+                    return value
+
+            while True:
+                if not func.code():
+                    value = func.return_type.type.default
+                    break
+
+                if runtime.tail is None:
+                    value = runtime.returned
+
+                    if not func.checked:
+                        call_type = get_type(value)
+                        ret_type = func.return_type.get_type()
+
+                        assert call_type == ret_type, f'Expected "{ret_type}" RETURN type, got "{call_type}"'
+                    break
+
+                # a tail call of itself runs the body again in a fresh frame, instead of nesting another one
+                values, tail = runtime.tail
+                runtime.tail = None
+
+                if runtime.limits is not None:
+                    runtime.limits.step()
+
+                scope.remove_scope()
+                scope.add_scope()
+                self.bind(params, values, tail)
+
+            if func.cache is not None:
+                func.cache.put(key, value)
+
+            runtime.pop_frame()
+            self.call_stack.pop()
+
+            return value
+        return run if self.profiler is None else self.profiler.timed(run, name=name)
+
+    def return_stmt(self, tree):
+        value, runtime, call_stack = self.compile(tree.children[0]), self.runtime, self.call_stack
+
+        def run():
+            assert len(call_stack) and isinstance(call_stack[-1], Function), "RETURN statement ouside Function block"
+
+            runtime.returned = value()
+            return True
+
+        # the optimizer marks the RETURNs of a FUNCTION's calls of itself where its frame can be reused,
+        # which holds as long as the name still resolves to the FUNCTION running
+        if not getattr(tree.meta, "tail", False):
+            return run
+
+        call = tree.children[0]
+        cell, args = self.scope.cell(str(call.children[0])), [*map(self.compile, call.children[1].children)]
+        checked = id(call) in self.checked
+
+        def tail():
+            assert len(call_stack) and isinstance(call_stack[-1], Function), "RETURN statement ouside Function block"
+
+            func = call_stack[-1]
+
+            if not cell or cell[-1] is not func or len(args) != len(func.params):
+                runtime.returned = value()
+                return True
+
+            runtime.tail = ([arg() for arg in args], checked)
+            return True
+        return tail
+
+    # builtin functions
+    def length(self, tree):
+        value = self.compile(tree.children[0])
+
+        def run():
+            v = value()
+
+            assert type(v) in [str, Array], f'Cannot apply LENGTH() to "{get_type(v)}"'
+
+            return len(v)
+        return run
+
+    def array_sum(self, tree):
+        value = self.compile(tree.children[0])
+        return lambda: bulk("SUM", value()).sum()
+
+    def array_min(self, tree):
+        value = self.compile(tree.children[0])
+        return lambda: bulk("MIN", value()).min()
+
+    def array_max(self, tree):
+        value = self.compile(tree.children[0])
+        return lambda: bulk("MAX", value()).max()
+
+    def index_of(self, tree):
+        value, item = map(self.compile, tree.children)
+
+        def run():
+            v, i = value(), item()
+            return bulk("INDEXOF", v).index_of(i)
+        return run
+
+    # FILL, SORT and COPY rebind the array to the one the builtin built
+    def fill(self, tree):
+        name, value = str(tree.children[0]), self.compile(tree.children[1])
+        cell = self.scope.cell(name)
+        get = resolve(cell, name)
+
+        def run():
+            v = value()
+            cell[-1].value = bulk("FILL", get()).filled(v)
+        return run
+
+    def sort(self, tree):
+        name = str(tree.children[0])
+        cell = self.scope.cell(name)
+        get = resolve(cell, name)
+
+        def run():
+            cell[-1].value = bulk("SORT", get()).sorted()
+        return run
+
+    def copy(self, tree):
+        name, source = str(tree.children[0]), self.compile(tree.children[1])
+        cell = self.scope.cell(name)
+        get = resolve(cell, name)
+
+        def run():
+            v = source()
+            cell[-1].value = bulk("COPY", get()).copy_from(v)
+        return run
+
+    def type_cast(self, tree):
+        cast, value = TYPES[tree.children[0]], self.compile(tree.children[1])
+
+        def run():
+            v = value()
+
+            try:
+                return cast.bind(v)
+            except:
+                raise Exception(f'Cannot cast "{get_type(v)}" to "{cast.name}"')
+        return run
\ No newline at end of file
@@ -0,0 +1,90 @@
+import sys
+from ptypes import Array
+
+# characters of output collected before they are handed to the sink
+BUFFER_SIZE = 64 * 1024
+
+# characters of input read from the source at a time
+CHUNK_SIZE = 64 * 1024
+
+# collects OUTPUT text and writes it to the sink (stdout, a file or an io.StringIO) in large pieces
+class Output:
+    def __init__(self, sink=None, buffer_size=BUFFER_SIZE, line_buffered=None):
+        self.sink = sys.stdout if sink is None else sink
+        self.buffer_size = buffer_size
+
+        # a terminal sees every line as soon as it is output, anything else only when the buffer fills
+        self.line_buffered = self.sink.isatty() if line_buffered is None else line_buffered
+
+        self.parts, self.size = [], 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def output(self, values, end):
+        if any(type(value) is Array for value in values):
+            # arrays are formatted into the buffer a piece at a time instead of as one big string
+            for i, value in enumerate(values):
+                if i:
+                    self.write(" ")
+
+                if type(value) is Array:
+                    value.write(self.write)
+                else:
+                    self.write(str(value))
+
+            self.write(end)
+        else:
+            self.write(" ".join(map(str, values)) + end)
+
+        if self.line_buffered:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.sink.write("".join(self.parts))
+            self.parts.clear()
+            self.size = 0
+
+        self.sink.flush()
+
+# serves INPUT lines from a file-like source read in large chunks, or from the user when there is none
+class Input:
+    def __init__(self, source=None, chunk_size=CHUNK_SIZE):
+        self.source, self.chunk_size = source, chunk_size
+        self.interactive = source is None
+
+        # lines split off the last chunk, and the unfinished line at its end
+        self.lines, self.next, self.rest = [], 0, ""
+
+    def readline(self):
+        if self.interactive:
+            try:
+                return input()
+            except EOFError:
+                raise Exception("No more input to read") from None
+
+        while self.next == len(self.lines):
+            self.fill()
+
+        line = self.lines[self.next]
+        self.next += 1
+        return line
+
+    def fill(self):
+        chunk = self.source.read(self.chunk_size)
+
+        if chunk:
+            self.lines = (self.rest + chunk).split("\n")
+            self.rest = self.lines.pop()
+        elif self.rest:
+            # the last line has no newline after it
+            self.lines, self.rest = [self.rest], ""
+        else:
+            raise Exception("No more input to read")
+
+        self.next = 0
\ No newline at end of file
@@ -1,7 +1,11 @@
+import operator
 from lark.visitors import Token, Tree, Interpreter
 from ast import literal_eval
 from pchar import *
 from scope import *
+from console import *
+from profiler import *
+from limits import *
 
 class Param:
     def __init__(self, type, sub_type=None):
@@ -25,51 +29,162 @@ class Param:
 def format_error(file, line_no, error, line):
     return f'{file}:{line_no}: {error}\n\t{line}'
 
+# ends the program like sys.exit with the formatted error, keeping the error and line apart for programs run in-process
+class ProgramExit(SystemExit):
+    def __init__(self, file, line, error, code):
+        super().__init__(format_error(file, line, error, code.splitlines()[line - 1]))
+        self.error, self.line = str(error), line
+
+# a hoisted expression that hasn't been evaluated since its loop started
+UNSET = object()
+
+def operation_error(*values):
+    if len(values) == 1:
+        return Exception(f'Operation not supported on "{get_type(values[0])}"')
+
+    a, b = values
+    return Exception(f'Operation not supported between "{get_type(a)}" and "{get_type(b)}"')
+
 class Interpreter(Interpreter):
-    def __init__(self, file, code, no_newlines):
+    def __init__(self, file, code, no_newlines, max_depth=None, out=None, inp=None, profiler=None, checked=None, memo=None, limits=None, parallel=None):
         self.file, self.code = file, code
         self.no_newlines = no_newlines
 
+        self.out = Output() if out is None else out
+        self.inp = Input() if inp is None else inp
+
         self.scope = Scope()
+
+        # the subroutines running now, innermost last
         self.call_stack = []
 
+        # what the last RETURN gave back, and the arguments of a FUNCTION's tail call of itself
+        self.returned, self.tail = None, None
+
+        # live subroutine frames, capped by max_depth when it is set
+        self.depth, self.max_depth = 0, max_depth
+
+        # nodes the static checker proved well typed, which skip their runtime type checks
+        self.checked = set() if checked is None else checked
+
+        # values of the expressions the optimizer hoisted out of the loops running now
+        self.invariants = {}
+
+        # the parts of each FOR loop that has run, by the id of its node
+        self.loops = {}
+
+        # caches of the pure functions, when memoization is on
+        self.memo = memo
+
+        # caps on the steps the program takes and the memory its arrays hold, None without any
+        self.limits = limits
+
+        # splits the loops whose iterations are independent across processes, when running in parallel
+        self.parallel = parallel
+
+        # only a profiled run pays for timing each node
+        self.profiler = profiler
+        if profiler is not None:
+            self._visit_tree = self.profiled_visit
+
+    def profiled_visit(self, tree):
+        timed = 0
+
+        if tree.data in STATEMENTS:
+            self.profiler.line(tree.meta.line)
+            timed += 1
+
+        if tree.data in ["call_function", "call_procedure"]:
+            self.profiler.call(str(tree.children[0]))
+            timed += 1
+
+        try:
+            return super()._visit_tree(tree)
+        finally:
+            for _ in range(timed):
+                self.profiler.leave()
+
     def check_newline(self, stmt):
         return isinstance(stmt, Token) and stmt.type == "NEWLINE"
-            
+
+    # statements give back True when they ran a RETURN, which stops the ones after it
+    def statements(self, stmts):
+        for stmt in stmts:
+            if isinstance(stmt, Tree) and self.visit(stmt):
+                return True
+        return False
+
     def check_indices(self, collection, indices):
         for i in range(len(indices)):
             index = indices[i]
-            a = collection[0] if len(indices) > 1 and i > 0 else collection
+            size = collection.shape[i] if isinstance(collection, Array) else len(collection)
 
             assert isinstance(index, int), "Index must be an integer"
-            assert index in range(1, len(a) + 1), f'Index "{index}" out of bounds'
+            assert index in range(1, size + 1), f'Index "{index}" out of bounds'
 
     def catch_error(func):
         def wrapper(self, tree):
             try:
-                try:
-                    return func(self, tree)
-                except TypeError:
-                    a, b = map(self.visit, tree.children)
-                    raise Exception(f'Operation not supported between "{get_type(a)}" and "{get_type(b)}"')
-            except ReturnCall:
-                raise
+                return func(self, tree)
             except Exception as e:
-                import sys
-                
-                sys.exit(format_error(self.file, tree.meta.line, e, self.code.splitlines()[tree.meta.line - 1]))
+                raise ProgramExit(self.file, tree.meta.line, e, self.code)
         return wrapper
+
+    # evaluates an expression on a line of its own inside a compound statement, like an ELSE IF or UNTIL condition
+    def located(self, tree):
+        try:
+            return self.visit(tree)
+        except Exception as e:
+            raise ProgramExit(self.file, tree.meta.line, e, self.code)
+
+    # errors are reported at the line of the statement they happen in, expressions don't catch their own
+    @catch_error
+    def statement(self, tree):
+        self.visit(tree.children[0])
+
+    # operands are evaluated once, the error for a type they don't support is built from their values
+    def binary_op(op):
+        def run(self, tree):
+            a, b = self.visit(tree.children[0]), self.visit(tree.children[1])
+
+            try:
+                return op(a, b)
+            except TypeError:
+                raise operation_error(a, b) from None
+        return run
     
     def scoped(func):
         def wrapper(self, *args, **kwargs):
             self.scope.add_scope()
             
-            func(self, *args, **kwargs)
-
-            self.scope.remove_scope()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self.scope.remove_scope()
         
         return wrapper
 
+    def hoisting(func):
+        def wrapper(self, tree):
+            hoisted = getattr(tree.children[0].meta, "hoisted", None)
+
+            if not hoisted:
+                return func(self, tree)
+
+            # a recursive call can run the same loop again, the outer run gets its values back afterwards
+            values = self.invariants
+            saved = [values.pop(id(node), UNSET) for node in hoisted]
+
+            try:
+                return func(self, tree)
+            finally:
+                for node, value in zip(hoisted, saved):
+                    if value is UNSET:
+                        values.pop(id(node), None)
+                    else:
+                        values[id(node)] = value
+        return wrapper
+
     # data types
     def number(self, tree):
         n = tree.children[0]
@@ -85,74 +200,42 @@ class Interpreter(Interpreter):
         return PChar(literal_eval(tree.children[0]))
 
     # arithmetic operators
-    @catch_error
     def neg(self, tree):
-        return -self.visit(tree.children[0])
-
-    @catch_error
-    def add(self, tree):
-        return self.visit(tree.children[0]) + self.visit(tree.children[1])
-
-    @catch_error
-    def sub(self, tree):
-        return self.visit(tree.children[0]) - self.visit(tree.children[1])
+        a = self.visit(tree.children[0])
 
-    @catch_error
-    def mul(self, tree):
-        return self.visit(tree.children[0]) * self.visit(tree.children[1])
-
-    @catch_error
-    def div(self, tree):
-        return self.visit(tree.children[0]) / self.visit(tree.children[1])
-    
-    @catch_error
-    def mod(self, tree):
-        return self.visit(tree.children[0]) % self.visit(tree.children[1])
+        try:
+            return -a
+        except TypeError:
+            raise operation_error(a) from None
+
+    add = binary_op(operator.add)
+    sub = binary_op(operator.sub)
+    mul = binary_op(operator.mul)
+    div = binary_op(operator.truediv)
+    mod = binary_op(operator.mod)
     
     # logical operators
-    @catch_error
     def not_op(self, tree):
         return not self.visit(tree.children[0])
 
-    @catch_error
     def and_op(self, tree):
         return self.visit(tree.children[0]) and self.visit(tree.children[1])
 
-    @catch_error
     def or_op(self, tree):
         return self.visit(tree.children[0]) or self.visit(tree.children[1])
      
     # comparision operators
-    @catch_error
-    def gt(self, tree):
-        return self.visit(tree.children[0]) > self.visit(tree.children[1])
-    
-    @catch_error
-    def lt(self, tree):
-        return self.visit(tree.children[0]) < self.visit(tree.children[1])
-    
-    @catch_error
-    def gte(self, tree):
-        return self.visit(tree.children[0]) >= self.visit(tree.children[1])
-    
-    @catch_error
-    def lte(self, tree):
-        return self.visit(tree.children[0]) <= self.visit(tree.children[1])
-    
-    @catch_error
-    def eq(self, tree):
-        return self.visit(tree.children[0]) == self.visit(tree.children[1])
-    
-    @catch_error
-    def neq(self, tree):
-        return self.visit(tree.children[0]) != self.visit(tree.children[1])
+    gt = binary_op(operator.gt)
+    lt = binary_op(operator.lt)
+    gte = binary_op(operator.ge)
+    lte = binary_op(operator.le)
+    eq = binary_op(operator.eq)
+    neq = binary_op(operator.ne)
     
     # variables
-    @catch_error
     def var(self, tree):
         return self.scope.get(tree.children[0])
 
-    @catch_error
     def declaration(self, tree):
         name, block = tree.children
 
@@ -162,7 +245,7 @@ class Interpreter(Interpreter):
             for bounds in block.children[:-1]:
                 l, u = map(self.visit, bounds.children)
 
-                assert isinstance(l, int) and isinstance(u, int), self.get_error("Array indices must be integers", tree)
+                assert isinstance(l, int) and isinstance(u, int), "Array indices must be integers"
                 assert u >= l, "Invalid array bounds"
                 assert l == 1, "Array must be 1-indexed"
 
@@ -170,84 +253,120 @@ class Interpreter(Interpreter):
 
             type = block.children[-1]
 
-            
-            if len(dimensions) > 1:
-                value = [[TYPES[type].default] * dimensions[1][1] for _ in range(dimensions[0][1])]
-            else:
-                value = [TYPES[type].default] * dimensions[0][1]
-
+            value = (Array if self.limits is None else self.limits.array)(str(type), tuple(u for _, u in dimensions))
 
             self.scope.define(str(name), Variable(TYPES["ARRAY"], value, True, type))
         else:
             self.scope.define(str(name), Variable(TYPES[block], TYPES[block].default, True))
 
-    @catch_error
     def constant(self, tree):
         name, value = tree.children[0], self.visit(tree.children[1])
         self.scope.define(str(name), Variable(TYPES[get_type(value)], value, False))
 
-    @catch_error
     def assignment(self, tree):
-        name, value = tree.children[0], self.visit(tree.children[1])
+        name, value = tree.children
+
+        if value.data == "add" and getattr(tree.meta, "append", False):
+            if not self.scope.cells.get(name):
+                raise Exception(f'Variable "{name}" is not defined')
+
+            return self.append(name, self.visit(value.children[1]))
+
+        value = self.visit(value)
+
+        if id(tree) in self.checked:
+            self.scope.set(name, value)
+        else:
+            self.scope.assign(name, value)
+
+    # name <- name + text, which the optimizer marks for STRINGs when text makes no calls that could change name first.
+    # repeated appends to a variable only copy what it holds once it is read
+    def append(self, name, text):
+        if type(text) is str and self.scope.append(name, text):
+            return
+
+        value = self.scope.get(name)
+
+        try:
+            value = value + text
+        except TypeError:
+            raise operation_error(value, text) from None
+
         self.scope.assign(name, value)
 
-    @catch_error
     def index_assignment(self, tree):
         name, indices, value = tree.children[0], *map(self.visit, tree.children[1:])
 
         var = self.scope.get(name)
-    
-        assert isinstance(var, list), f'Cannot apply index assignment to "{get_type(var)}"'
-        
-        if len(indices) == 1 and isinstance(var[0], list):
-            raise Exception(f'Cannot assign to "{get_type(var[0])}"')
-        
-        cmp = var[0][0] if len(indices) > 1 else var[0]
-        assert type(value) == type(cmp), f'Assignment type mismatch, expected "{get_type(cmp)}", got "{get_type(value)}"'
+
+        if id(tree) not in self.checked:
+            assert isinstance(var, Array), f'Cannot apply index assignment to "{get_type(var)}"'
+            
+            if len(indices) == 1 and len(var.shape) > 1:
+                raise Exception(f'Cannot assign to "{type_repr("ARRAY", var.type)}"')
+
+            if len(indices) > 1 and len(var.shape) == 1:
+                raise Exception(f'Cannot apply 2D indexing to "{get_type(var)}"')
+            
+            assert type(value) == TYPES[var.type].bind, f'Assignment type mismatch, expected "{var.type}", got "{get_type(value)}"'
 
         self.check_indices(var, indices)
 
         self.scope.assign_index(name, [*map(lambda x: x - 1, indices)], value)
 
     # indexing
-    @catch_error
     def get_index(self, tree):
         value, indices = map(self.visit, tree.children)
 
-        assert type(value) in [str, list], f'Cannot apply indexing to "{get_type(value)}"'
+        assert type(value) in [str, Array], f'Cannot apply indexing to "{get_type(value)}"'
         
-        if len(indices) > 1 and not isinstance(value[0], list):
+        if len(indices) > 1 and (type(value) is str or len(value.shape) == 1):
             raise Exception(f'Cannot apply 2D indexing to "{get_type(value)}"')
 
         self.check_indices(value, indices)
 
         indices = [*map(lambda x: x - 1, indices)]
 
-        return value[indices[0]][indices[1]] if len(indices) > 1 else value[indices[0]]
+        return value.get(indices[0] * value.shape[1] + indices[1]) if len(indices) > 1 else value[indices[0]]
+
+    # loop invariants, evaluated the first time they are reached in each run of their loop
+    def hoisted(self, tree):
+        value = self.invariants.get(id(tree), UNSET)
+
+        if value is UNSET:
+            value = self.invariants[id(tree)] = self.visit(tree.children[0])
+        return value
 
     # i/o
     @catch_error
     def output(self, tree):
         out = [self.visit(child) for child in tree.children if not self.check_newline(child)]
-        print(" ".join(map(str, out)), end=("" if self.no_newlines else "\n"))
+        self.out.output(out, "" if self.no_newlines else "\n")
 
     @catch_error
     def input(self, tree):
-        self.scope.define(tree.children[0], Variable(TYPES["STRING"], input(), True))
+        self.scope.define(tree.children[0], Variable(TYPES["STRING"], self.read_line(), True))
+
+    def read_line(self):
+        # anything already output has to be visible before the program waits on the user
+        if self.inp.interactive:
+            self.out.flush()
+
+        return self.inp.readline()
 
     # conditionals
     @scoped
     @catch_error
     def conditional(self, tree):
         for branch in tree.children[0].children:
-            if "if_branch" in branch.data:
+            if branch.data == "if_branch":
                 if not self.visit(branch.children[0]):
                     continue
+            elif branch.data == "elseif_branch":
+                if not self.located(branch.children[0]):
+                    continue
             
-            for stmt in branch.children[1:]:
-                if not self.check_newline(stmt):
-                    self.visit(stmt)
-            return
+            return self.statements(branch.children[1:])
 
     @scoped
     @catch_error
@@ -261,78 +380,142 @@ class Interpreter(Interpreter):
                 continue
 
             if branch.data == "otherwise_branch":
-                self.visit(branch)
-                return
+                return self.visit(branch.children[0])
 
-            condition = self.visit(branch.children[0])
+            condition = self.located(branch.children[0])
             
             if condition == self.scope.get(identifier):
-                self.visit(branch.children[1])
-                return
+                return self.visit(branch.children[1])
      
     # loops
+    @hoisting
     @scoped
     @catch_error
     def while_loop(self, tree):
-        block = tree.children[0].children
+        block, limits = tree.children[0].children, self.limits
 
         while self.visit(block[0]):
-            for stmt in block[1:]:
-                if not self.check_newline(stmt):
-                    self.visit(stmt)
+            if limits is not None:
+                limits.step()
+
+            if self.statements(block[1:]):
+                return True
 
+    @hoisting
     @scoped
     @catch_error
     def repeat_until(self, tree):
         block = [line for line in tree.children[0].children if not self.check_newline(line)]
+        limits = self.limits
 
         condition = True
 
         while condition:
-            for stmt in block[:-1]:
-                self.visit(stmt)
+            if limits is not None:
+                limits.step()
+
+            if self.statements(block[:-1]):
+                return True
                 
-            condition = not self.visit(block[-1])
+            condition = not self.located(block[-1])
 
+    @hoisting
     @scoped
     @catch_error
     def for_loop(self, tree):
-        block = tree.children[0].children
+        loop = self.loops.get(id(tree))
 
-        is_step = getattr(block[3], "data", None) == 'step'
+        if loop is None:
+            loop = self.loops[id(tree)] = self.prepare_loop(tree.children[0].children)
 
-        step = self.visit(block[3])[0] if is_step else 1
-        iterator, start, stop = block[0], self.visit(block[1]), self.visit(block[2]) + (-1 if step < 0 else 1)
+        iterator, start, stop, step, body = loop
+
+        step = 1 if step is None else self.visit(step)
+        start, stop = self.visit(start), self.visit(stop) + (-1 if step < 0 else 1)
 
         assert step != 0, "Iteration step cannot be 0"
-        
-        self.scope.define(iterator, Variable(TYPES['INTEGER'], start, True))
+        assert all(isinstance(i, int) for i in (start, stop, step)), "Iteration bounds must be integers"
+
+        iterations = range(start, stop, step)
+
+        if self.parallel is not None and id(tree) in self.parallel.loops:
+            return self.parallel.run(self, tree, iterations, lambda part: self.iterate(iterator, part, body))
+
+        return self.iterate(iterator, iterations, body)
+
+    # runs the body of a FOR loop once for each value of its iterator
+    def iterate(self, iterator, iterations, body):
+        var = Variable(TYPES['INTEGER'], iterations.start, True)
+        self.scope.define(iterator, var)
+
+        cell, visit, limits = self.scope.cells[iterator], self.visit, self.limits
 
-        for i in range(start, stop, step):
-            self.scope.assign(iterator, i)
+        for i in iterations:
+            if limits is not None:
+                limits.step()
 
-            for stmt in block[4:] if is_step else block[3:]:
-                if not self.check_newline(stmt):
-                    self.visit(stmt)
+            # unless the body redeclared the iterator, it is still the variable defined above
+            if cell[-1] is var:
+                var.value = i
+            else:
+                self.scope.assign(iterator, i)
+
+            for stmt in body:
+                if visit(stmt):
+                    return True
+
+    # the iterator, the bound and step expressions (None without a STEP) and the statements of a FOR loop
+    def prepare_loop(self, block):
+        is_step = getattr(block[3], "data", None) == 'step'
+        body = [stmt for stmt in block[4 if is_step else 3:] if isinstance(stmt, Tree)]
+
+        return str(block[0]), block[1], block[2], block[3].children[0] if is_step else None, body
+
+    # runs some of the iterations of a FOR loop, the part of it a worker process was given
+    def run_loop(self, tree, iterations):
+        iterator, _, _, _, body = self.prepare_loop(tree.children[0].children)
+        return self.iterate(iterator, iterations, body)
 
     # subroutines
-    def set_args(self, params, args):
+    def set_args(self, params, args, checked=False):
         assert len(params) == len(args), f"Expected {len(params)} arguments, got {len(args)}"
 
-        self.scope.add_scope()
+        # arguments are evaluated in the caller's scope
+        args = [*map(self.visit, args)]
+
+        self.push_frame()
+        self.bind(params, args, checked)
 
+        return args
+
+    # defines the parameters in the frame of the call
+    def bind(self, params, args, checked):
         for i in range(len(args)):
-            arg = self.visit(args[i])
+            arg = args[i]
 
-            # pass arrays by value
-            if isinstance(arg, list):
-                arg = arg[:]
+            # pass arrays by value, storage is only copied once either side writes to it
+            if isinstance(arg, Array):
+                arg = arg.share()
 
-            param_type = params[i][1].get_type()
-            assert get_type(arg) == param_type, f'Expected "{param_type}" argument type, got "{get_type(arg)}"'
+            if not checked:
+                param_type = params[i][1].get_type()
+                assert get_type(arg) == param_type, f'Expected "{param_type}" argument type, got "{get_type(arg)}"'
 
             self.scope.define(params[i][0], Variable(TYPES[params[i][1].type.name], arg, True))
 
+    def push_frame(self):
+        assert not self.max_depth or self.depth < self.max_depth, f"Maximum recursion depth of {self.max_depth} exceeded"
+
+        if self.limits is not None:
+            self.limits.step()
+
+        self.depth += 1
+        self.scope.add_scope()
+
+    def pop_frame(self):
+        self.depth -= 1
+        self.scope.remove_scope()
+
     def get_param(self, block):
         if getattr(block, "data", None) == "arg_param":
             if getattr(block.children[0], "data", None) == "arg_param":
@@ -367,8 +550,6 @@ class Interpreter(Interpreter):
 
     @catch_error
     def call_procedure(self, tree):
-        self.call_stack.append("procedure")
-
         name = tree.children[0]
         
         try:
@@ -379,13 +560,12 @@ class Interpreter(Interpreter):
         assert not isinstance(proc, Function), f'Cannot "CALL" Function, directly invoke instead'
         
         args = tree.children[1].children if len([i for i in tree.children if not self.check_newline(i)]) > 1 else []
-        self.set_args([*proc.params.items()], args)
+        self.set_args([*proc.params.items()], args, id(tree) in self.checked)
+        self.call_stack.append(proc)
 
-        for line in proc.code:
-            if not self.check_newline(line):
-                self.visit(line)
+        self.statements(proc.code)
             
-        self.scope.remove_scope()
+        self.pop_frame()
         self.call_stack.pop()
 
     @catch_error
@@ -396,12 +576,11 @@ class Interpreter(Interpreter):
 
         ret_type = self.get_param(block[body])
 
-        self.scope.define(str(block[0]), Function(ret_type, params, block[body + 1:]))
+        cache = None if self.memo is None else self.memo.cache(tree)
 
-    @catch_error
-    def call_function(self, tree):
-        self.call_stack.append("function")
+        self.scope.define(str(block[0]), Function(ret_type, params, block[body + 1:], id(tree) in self.checked, cache))
 
+    def call_function(self, tree):
         name = tree.children[0]
         
         try:
@@ -411,42 +590,111 @@ class Interpreter(Interpreter):
         
         assert isinstance(func, Function), f'Cannot directly invoke Procedure "{name}", use "CALL"'
 
-        self.set_args([*func.params.items()], tree.children[1].children)
+        params = [*func.params.items()]
+        args = self.set_args(params, tree.children[1].children, id(tree) in self.checked)
+        self.call_stack.append(func)
 
-        try:
-            for line in func.code:
-                if not self.check_newline(line):
-                    self.visit(line)
-        except ReturnCall as rc:
-            call_type = get_type(rc.value) 
-            ret_type = func.return_type.get_type()
+        # a pure function called with the same arguments before gives back the same result
+        if func.cache is not None:
+            key, value = func.cache.get(args)
+
+            if value is not UNSET:
+                self.pop_frame()
+                self.call_stack.pop()
+                return value
+
+        while True:
+            if not self.statements(func.code):
+                value = func.return_type.type.default
+                break
+
+            if self.tail is None:
+                value = self.returned
+
+                if not func.checked:
+                    call_type = get_type(value)
+                    ret_type = func.return_type.get_type()
 
-            assert call_type == ret_type, f'Expected "{ret_type}" RETURN type, got "{call_type}"'
+                    assert call_type == ret_type, f'Expected "{ret_type}" RETURN type, got "{call_type}"'
+                break
+
+            # a tail call of itself runs the body again in a fresh frame, instead of nesting another one
+            args, checked = self.tail
+            self.tail = None
+
+            if self.limits is not None:
+                self.limits.step()
 
             self.scope.remove_scope()
-            return rc.value
-            
-        self.scope.remove_scope()
+            self.scope.add_scope()
+            self.bind(params, args, checked)
+
+        if func.cache is not None:
+            func.cache.put(key, value)
+
+        self.pop_frame()
         self.call_stack.pop()
 
-        return func.return_type.type.default
-    
+        return value
+
     @catch_error
     def return_stmt(self, tree):
-        assert len(self.call_stack) and self.call_stack[-1] == "function", "RETURN statement ouside Function block"
+        assert len(self.call_stack) and isinstance(self.call_stack[-1], Function), "RETURN statement ouside Function block"
+
+        call = tree.children[0]
 
-        raise ReturnCall(self.visit(tree.children[0]))
+        if not (call.data == "call_function" and getattr(tree.meta, "tail", False) and self.tail_call(call)):
+            self.returned = self.visit(call)
+        return True
+
+    # the optimizer marks the RETURNs of a FUNCTION's calls of itself where its frame can be reused,
+    # which holds as long as the name still resolves to the FUNCTION running
+    def tail_call(self, tree):
+        func, args = self.call_stack[-1], tree.children[1].children
+        cell = self.scope.cells.get(str(tree.children[0]))
+
+        if not cell or cell[-1] is not func or len(args) != len(func.params):
+            return False
+
+        self.tail = ([*map(self.visit, args)], id(tree) in self.checked)
+        return True
     
     # builtin functions
-    @catch_error
     def length(self, tree):
         value = self.visit(tree.children[0])
         
-        assert type(value) in [str, list], f'Cannot apply LENGTH() to "{get_type(value)}"'
+        assert type(value) in [str, Array], f'Cannot apply LENGTH() to "{get_type(value)}"'
 
         return len(value)
     
+    def array_sum(self, tree):
+        return bulk("SUM", self.visit(tree.children[0])).sum()
+
+    def array_min(self, tree):
+        return bulk("MIN", self.visit(tree.children[0])).min()
+
+    def array_max(self, tree):
+        return bulk("MAX", self.visit(tree.children[0])).max()
+
+    def index_of(self, tree):
+        value, item = map(self.visit, tree.children)
+        return bulk("INDEXOF", value).index_of(item)
+
+    @catch_error
+    def fill(self, tree):
+        name, value = tree.children[0], self.visit(tree.children[1])
+        self.scope.update(name, bulk("FILL", self.scope.get(name)).filled(value))
+
     @catch_error
+    def sort(self, tree):
+        name = tree.children[0]
+        self.scope.update(name, bulk("SORT", self.scope.get(name)).sorted())
+
+    @catch_error
+    def copy(self, tree):
+        name, source = tree.children[0], self.visit(tree.children[1])
+        self.scope.update(name, bulk("COPY", self.scope.get(name)).copy_from(source))
+    
     def type_cast(self, tree):
         cast, value = TYPES[tree.children[0]], self.visit(tree.children[1])
         
@@ -0,0 +1,43 @@
+import math
+import weakref
+from ptypes import *
+
+# bytes an element takes in the storage an array is declared with, the others hold references
+ELEMENT_SIZE = {"INTEGER": 8, "REAL": 8, "BOOLEAN": 1, "CHAR": 1}
+REFERENCE_SIZE = 8
+
+# caps on the steps a program takes and the memory its arrays hold, so a runaway program stops with an error.
+# a step is a loop iteration or a subroutine call, nothing runs for long without taking them
+class Limits:
+    def __init__(self, max_steps=None, max_memory=None):
+        self.max_steps, self.max_memory = max_steps, max_memory
+
+        # steps left, and bytes held by the declared arrays that are still alive
+        self.steps, self.memory = max_steps or math.inf, 0
+
+    def step(self):
+        self.steps -= 1
+
+        if self.steps < 0:
+            raise Exception(f"Maximum of {self.max_steps} steps exceeded")
+
+    # declares an array, checking its size before any of it is allocated
+    def array(self, type, shape):
+        if not self.max_memory:
+            return Array(type, shape)
+
+        size = math.prod(shape) * ELEMENT_SIZE.get(type, REFERENCE_SIZE)
+
+        if self.memory + size > self.max_memory:
+            raise Exception(f"Maximum memory of {self.max_memory} bytes exceeded")
+
+        array = Array(type, shape)
+
+        # given back once nothing refers to the array anymore
+        self.memory += size
+        weakref.finalize(array, self.release, size)
+
+        return array
+
+    def release(self, size):
+        self.memory -= size
\ No newline at end of file
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from checker import *
+
+# the results of a FUNCTION for the arguments it was called with, least recently used first
+class Cache:
+    def __init__(self, name, line, size):
+        self.name, self.line, self.size = name, line, size
+        self.values = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, args):
+        # -0.0 equals 0.0 but outputs differently
+        key = tuple(arg.hex() if type(arg) is float else arg for arg in args)
+        value = self.values.get(key, UNSET)
+
+        if value is UNSET:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.values.move_to_end(key)
+
+        return key, value
+
+    def put(self, key, value):
+        self.values[key] = value
+
+        if self.size and len(self.values) > self.size:
+            self.values.popitem(False)
+
+# finds the FUNCTIONs whose result only depends on their arguments: they read nothing but their own
+# parameters, locals and global CONSTANTs, change nothing outside their frame, do no OUTPUT or INPUT
+# and only call global FUNCTIONs that are pure as well
+class Purity(Checker):
+    def pure(self, tree):
+        # every FUNCTION by the id of its node, with its signature
+        self.functions = {}
+
+        # FUNCTIONs that touch something besides their arguments, and the global FUNCTIONs each one calls
+        self.impure, self.callees = set(), {}
+
+        # the FUNCTION being checked, None outside of them and in PROCEDUREs
+        self.current = None
+
+        self.check(tree)
+
+        changed = True
+        while changed:
+            changed = False
+
+            for function, callees in self.callees.items():
+                if function not in self.impure and callees & self.impure:
+                    self.impure.add(function)
+                    changed = True
+
+        # arrays are left out, they would have to be copied into the key and out of the cache on every call
+        return {
+            function for function, symbol in self.functions.items()
+            if function not in self.impure and not any(type.startswith("ARRAY") for type in [symbol.type, *(param for _, param in symbol.params)])
+        }
+
+    def taint(self):
+        if self.current is not None:
+            self.impure.add(self.current)
+
+    # a global that is always the same CONSTANT, wherever it is resolved from
+    def constant(self, name):
+        stmt = self.top.get(name)
+        return name not in self.nonglobal and stmt is not None and stmt.data == "statement" and stmt.children[0].data == "constant"
+
+    def access(self, name):
+        if self.current is not None and not self.local(name) and not self.constant(name):
+            self.taint()
+
+    def define(self, stmt):
+        # a subroutine defined inside a FUNCTION changes its frame
+        self.taint()
+
+        outer = self.current
+        self.current = id(stmt) if stmt.data == "function" else None
+
+        if self.current is not None:
+            self.functions[self.current] = self.signature(stmt.children[0])
+            self.callees[self.current] = set()
+
+        super().define(stmt)
+        self.current = outer
+
+    def stmt_output(self, stmt):
+        self.taint()
+        super().stmt_output(stmt)
+
+    def stmt_input(self, stmt):
+        self.taint()
+        super().stmt_input(stmt)
+
+    def stmt_call_procedure(self, stmt):
+        self.taint()
+        super().stmt_call_procedure(stmt)
+
+    def expr_hoisted(self, tree):
+        return self.expr(tree.children[0])
+
+    def expr_call_function(self, tree):
+        name = str(tree.children[0])
+        stmt = self.top.get(name)
+
+        if self.current is not None:
+            if self.local(name) or name in self.nonglobal or stmt is None or stmt.data != "function":
+                self.taint()
+            else:
+                self.callees[self.current].add(id(stmt))
+
+        return super().expr_call_function(tree)
+
+# caches the results of pure FUNCTIONs, engines only route calls through it when memoization is on
+class Memo:
+    def __init__(self, size):
+        # results kept per FUNCTION, 0 for no limit
+        self.size = size
+
+        # ids of the FUNCTION nodes that can be memoized, and their caches once they are defined
+        self.pure, self.caches = set(), {}
+
+    def analyse(self, file, code, tree):
+        try:
+            self.pure = Purity(file, code).pure(tree)
+        except CheckError:
+            # the program is left to run into its type error, without memoizing anything
+            self.pure = set()
+
+    # the cache of a FUNCTION node, shared by every time its definition runs, None if it isn't pure
+    def cache(self, tree):
+        if id(tree) not in self.pure:
+            return None
+
+        cache = self.caches.get(id(tree))
+        if cache is None:
+            cache = self.caches[id(tree)] = Cache(str(tree.children[0].children[0]), tree.meta.line, self.size)
+
+        return cache
+
+    def stats(self):
+        rows = [f"{'calls':>9} {'hits':>9} {'misses':>9} {'hit rate':>9} {'cached':>9}  function"]
+
+        for cache in sorted(self.caches.values(), key=lambda cache: -(cache.hits + cache.misses)):
+            calls = cache.hits + cache.misses
+            rate = f"{cache.hits / calls:.1%}" if calls else "-"
+
+            rows.append(f"{calls:>9} {cache.hits:>9} {cache.misses:>9} {rate:>9} {len(cache.values):>9}  {cache.name} (line {cache.line})")
+
+        return "\n".join(rows)
\ No newline at end of file
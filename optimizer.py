@@ -0,0 +1,326 @@
+import math
+from checker import *
+
+# longest STRING a constant expression is folded into, anything longer is still built when the program runs
+MAX_STRING = 256
+
+LITERALS = ["number", "string", "boolean", "char"]
+
+# expressions whose value only depends on the values of their operands
+FOLDABLE = ["add", "sub", "mul", "div", "mod", "gt", "lt", "gte", "lte", "eq", "neq", "neg", "not_op", "and_op", "or_op", "length", "type_cast"]
+
+# expressions that give the same value for as long as the variables in them keep theirs
+PURE = FOLDABLE + ["get_index", "index", "array_sum", "array_min", "array_max", "index_of"]
+
+# nodes that bind the name they start with in the scope they run in
+BINDS = ["declaration", "constant", "input", "for_loop", "procedure", "function", "param"]
+
+# nodes that change the value of a binding that already exists, which can be the caller's.
+# all but assignment only change the elements of an array, never its shape
+UPDATES = ["assignment", "index_assignment", "fill", "sort", "copy"]
+
+# rewrites a node in place into the literal for a value, if there is one that reads back the same
+def make_literal(tree, value):
+    if type(value) is bool:
+        data, token = "boolean", Token("BOOLEAN", "TRUE" if value else "FALSE")
+    elif type(value) is int:
+        try:
+            data, token = "number", Token("NUMBER", str(value))
+        except ValueError:
+            return False
+    elif type(value) is float:
+        text = repr(value)
+
+        if not math.isfinite(value) or "." not in text or "e" in text:
+            return False
+        data, token = "number", Token("NUMBER", text)
+    elif type(value) is str and len(value) <= MAX_STRING:
+        data, token = "string", Token("STRING", repr(value))
+    elif type(value) is PChar:
+        data, token = "char", Token("CHAR", repr(str(value)))
+    else:
+        return False
+
+    tree.data, tree.children = data, [token]
+    return True
+
+# names a part of the program binds or changes anywhere in it
+def written(trees, kinds):
+    names = set()
+
+    for tree in trees:
+        if isinstance(tree, Tree):
+            for subtree in tree.iter_subtrees():
+                if subtree.data in kinds and isinstance(subtree.children[0], Token):
+                    names.add(str(subtree.children[0]))
+    return names
+
+def calls(trees):
+    return any(subtree.data in ["call_function", "call_procedure"] for tree in trees if isinstance(tree, Tree) for subtree in tree.iter_subtrees())
+
+# simplifies the parse tree before it runs: folds constant expressions, propagates CONSTANTs,
+# drops IF, CASE and WHILE branches that can never run and hoists loop-invariant expressions.
+# it reuses the checker's scoping, so a value is only propagated where the checker is sure of what a name is
+class Optimizer(Checker):
+    def optimize(self, tree):
+        # statements that can never do anything
+        self.dead = set()
+
+        # static types of the expressions, where the checker knows them
+        self.types = {}
+
+        # [name, names it binds, whether its frame can be reused] of each FUNCTION being checked, None for PROCEDUREs
+        self.frames = []
+
+        try:
+            self.check(tree)
+        except CheckError:
+            # what was folded so far still behaves the same, the type error is left for the program to run into
+            return tree
+
+        self.sweep(tree)
+
+        # a loop that calls a subroutine could have any of these changed under it, what a call binds is gone once it returns
+        subroutines = [subtree for subtree in tree.iter_subtrees() if subtree.data in ["procedure", "function"]]
+        self.changed, self.rebound = written(subroutines, UPDATES), written(subroutines, ["assignment"])
+        self.hoist(tree)
+
+        return tree
+
+    # folding
+    def expr(self, tree):
+        type = self.types[id(tree)] = super().expr(tree)
+        self.fold(tree)
+        return type
+
+    def fold(self, tree):
+        if tree.data == "var":
+            value = getattr(self.resolve(str(tree.children[0])), "value", UNSET)
+
+            if value is not UNSET:
+                make_literal(tree, value)
+            return
+
+        if tree.data not in FOLDABLE:
+            return
+
+        operands = [child for child in tree.children if isinstance(child, Tree)]
+
+        if any(operand.data not in LITERALS for operand in operands):
+            # AND and OR never look past a literal that decides them on its own
+            if tree.data in ["and_op", "or_op"] and operands[0].data in LITERALS:
+                value = self.runtime.visit(operands[0])
+
+                if bool(value) == (tree.data == "or_op"):
+                    make_literal(tree, value)
+            return
+
+        # repeating a STRING could build something far bigger than the program
+        if tree.data == "mul" and any(type(self.runtime.visit(operand)) is str for operand in operands):
+            return
+
+        try:
+            value = self.runtime.visit(tree)
+        except Exception:
+            # the error is left for the program to run into, at the time it would have
+            return
+
+        make_literal(tree, value)
+
+    def stmt_constant(self, node):
+        name, type = str(node.children[0]), self.expr(node.children[1])
+        symbol = Symbol("const", type)
+
+        # redeclaring it with another value leaves the name to the runtime, like any other conflicting declaration
+        if node.children[1].data in LITERALS:
+            symbol.value = self.runtime.visit(node.children[1])
+
+        self.declare(name, symbol)
+
+    # STRINGs built up by appending to them, which the engines do in place. the variable's type can't always be
+    # known from inside a subroutine, the engines check it. what is appended can't make calls, those could
+    # change the variable after its value would have been read
+    def stmt_assignment(self, node):
+        super().stmt_assignment(node)
+
+        name, value = str(node.children[0]), node.children[1]
+
+        if value.data == "add" and self.types.get(id(value.children[1])) == "STRING" and not calls(value.children[1:]):
+            if value.children[0].data == "var" and str(value.children[0].children[0]) == name:
+                node.meta.append = True
+
+    # dead branches
+    def stmt_conditional(self, stmt):
+        super().stmt_conditional(stmt)
+
+        node, branches = stmt.children[0], []
+
+        for branch in node.children:
+            if branch.data != "else_branch" and branch.children[0].data in LITERALS:
+                if not self.runtime.visit(branch.children[0]):
+                    continue
+
+                # always taken, so none of the branches after it ever are
+                branches.append(branch)
+                break
+
+            branches.append(branch)
+
+        # an ELSE can't come first
+        if branches and branches[0].data == "else_branch":
+            branches[0] = Tree("if_branch", [Tree("boolean", [Token("BOOLEAN", "TRUE")]), *branches[0].children], branches[0].meta)
+
+        node.children = branches
+
+        if not branches:
+            self.dead.add(id(stmt))
+
+    def stmt_switch(self, stmt):
+        super().stmt_switch(stmt)
+
+        node = stmt.children[0]
+        value = getattr(self.resolve(str(node.children[0])), "value", UNSET)
+
+        if value is UNSET:
+            return
+
+        children, matched = node.children[:1], False
+
+        for branch in node.children[1:]:
+            if isinstance(branch, Tree):
+                if matched:
+                    continue
+
+                if branch.data == "case_branch" and branch.children[0].data in LITERALS:
+                    if self.runtime.visit(branch.children[0]) != value:
+                        continue
+                    matched = True
+
+            children.append(branch)
+
+        node.children = children
+
+        if not any(isinstance(branch, Tree) for branch in children):
+            self.dead.add(id(stmt))
+
+    def stmt_while_loop(self, stmt):
+        super().stmt_while_loop(stmt)
+
+        condition = stmt.children[0].children[0]
+
+        if condition.data in LITERALS and not self.runtime.visit(condition):
+            self.dead.add(id(stmt))
+
+    # tail calls
+    def define(self, stmt):
+        node = stmt.children[0]
+        frame = None
+
+        if node.data == "function":
+            frame = [str(node.children[0]), written(node.children[1:], BINDS), True]
+
+        self.frames.append(frame)
+        super().define(stmt)
+        self.frames.pop()
+
+        if frame and frame[2]:
+            self.mark(node, frame[0])
+
+    # a FUNCTION whose frame is never looked into from past it, which is where a caller's frame is seen
+    # from, can reuse it for a call of itself that it RETURNs. it can't make any other calls, those could see it too
+    def access(self, name):
+        frame = self.frames[-1] if self.frames else None
+
+        if frame and name in frame[1] and not self.local(name):
+            frame[2] = False
+
+    def call(self, tree, args, kind):
+        frame, name = self.frames[-1] if self.frames else None, str(tree.children[0])
+
+        if frame and not (kind == "function" and name == frame[0] and name not in frame[1]):
+            frame[2] = False
+
+        return super().call(tree, args, kind)
+
+    def mark(self, tree, name):
+        for child in tree.children:
+            if not isinstance(child, Tree) or child.data in ["procedure", "function"]:
+                continue
+
+            if child.data == "return_stmt" and child.children[0].data == "call_function" and str(child.children[0].children[0]) == name:
+                child.meta.tail = True
+            else:
+                self.mark(child, name)
+
+    def sweep(self, tree):
+        for subtree in tree.iter_subtrees():
+            # a CASE branch is a single statement, which stays even if it does nothing
+            if subtree.data not in ["case_branch", "otherwise_branch"]:
+                subtree.children = [child for child in subtree.children if id(child) not in self.dead]
+
+    # loop invariants
+    def hoist(self, tree):
+        # where the parts of a loop that run on every iteration start
+        if tree.data == "for_loop" and isinstance(tree.children[0], Token):
+            start = 4 if getattr(tree.children[3], "data", None) == "step" else 3
+            iterator = {str(tree.children[0])}
+        elif tree.data in ["while_loop", "repeat_until"] and not (isinstance(tree.children[0], Tree) and tree.children[0].data == tree.data):
+            start, iterator = 0, set()
+        else:
+            start = None
+
+        if start is not None:
+            parts = tree.children[start:]
+            changed, rebound = iterator | written(parts, BINDS + UPDATES), iterator | written(parts, BINDS + ["assignment"])
+
+            if calls(parts):
+                changed, rebound = changed | self.changed, rebound | self.rebound
+
+            hoisted = []
+            self.lift(tree, (changed, rebound), hoisted, start)
+
+            # the engines evaluate these at most once each time the loop runs
+            if hoisted:
+                tree.meta.hoisted = hoisted
+
+        for child in tree.children:
+            if isinstance(child, Tree):
+                self.hoist(child)
+
+    def lift(self, tree, names, hoisted, start=0):
+        for i in range(start, len(tree.children)):
+            child = tree.children[i]
+
+            # subroutines only run when they are called, which could be long after the loop
+            if not isinstance(child, Tree) or child.data in ["procedure", "function", "hoisted"]:
+                continue
+
+            if child.data in PURE and child.data != "index" and self.invariant(child, names):
+                tree.children[i] = Tree("hoisted", [child], child.meta)
+                hoisted.append(tree.children[i])
+            else:
+                self.lift(child, names, hoisted)
+
+    def invariant(self, tree, names):
+        changed, rebound = names
+
+        if tree.data in LITERALS or tree.data == "hoisted":
+            return True
+        if tree.data == "var":
+            return str(tree.children[0]) not in changed
+
+        # the length of an array only changes when its name is bound to another one
+        if tree.data == "length" and (self.types.get(id(tree.children[0])) or "").startswith("ARRAY<"):
+            if self.same_shape(tree.children[0], names):
+                return True
+
+        if tree.data in PURE:
+            return all(self.invariant(child, names) for child in tree.children if isinstance(child, Tree))
+        return False
+
+    def same_shape(self, tree, names):
+        if tree.data == "var":
+            return str(tree.children[0]) not in names[1]
+        if tree.data == "get_index":
+            return self.same_shape(tree.children[0], names) and all(self.invariant(index, names) for index in tree.children[1].children)
+        return False
\ No newline at end of file
@@ -0,0 +1,398 @@
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from checker import *
+
+# a loop is only split up when what is left of it looks like it would take longer than this to run here, in seconds
+MIN_TIME = 0.05
+
+# how long a loop runs here first, to tell how long the rest of it would take
+PROBE_TIME = 0.005
+
+# values that can be copied to the workers as they are, arrays that aren't in compact storage included
+VALUES = (int, float, str, bool, PChar, Array)
+
+# a FOR loop being checked, and once it is known to be independent what running it in parts needs
+class Loop:
+    def __init__(self, block, iterator):
+        self.block, self.iterator = block, iterator
+        self.independent = True
+
+        # names from outside the loop that it uses
+        self.names = set()
+
+        # every index an array from outside the loop is written with, as its length and the positions of the iterator in it
+        self.writes = {}
+
+        # the reads of names from outside the loop: None for a whole value, "shape" for its size
+        # or the positions of the iterator in the index it is read at
+        self.reads = []
+
+        # the arrays it writes to, with their dimensions and the one every iteration only touches its own cells of
+        self.split = {}
+
+# finds the FOR loops whose iterations don't depend on each other: they do no OUTPUT or INPUT, call nothing, only assign
+# to variables declared inside the loop, and the arrays from outside it they write to are always indexed by its iterator
+# in the same dimension, where they are written and read, so every iteration has cells of its own
+class Independence(Checker):
+    def independent(self, tree):
+        # the independent loops by the id of their node, and the loops being checked now, innermost last
+        self.loops, self.running = {}, []
+
+        # what the indexing or LENGTH around a variable being checked reads of it, by the id of its node
+        self.contexts = {}
+
+        self.check(tree)
+        return self.loops
+
+    def taint(self):
+        for loop in self.running:
+            loop.independent = False
+
+    def loop_body(self, stmt, body):
+        loop = Loop(self.block, str(stmt.children[0].children[0]))
+
+        self.running.append(loop)
+        super().loop_body(stmt, body)
+        self.running.pop()
+
+        if self.settle(loop):
+            self.loops[id(stmt)] = loop
+
+    # the dimension each array the loop writes to is split on, False if some iterations could touch the same cells
+    def settle(self, loop):
+        if not loop.independent:
+            return False
+
+        for name, writes in loop.writes.items():
+            lengths = {length for length, _ in writes}
+            positions = frozenset.intersection(*(positions for _, positions in writes))
+
+            for read, context in loop.reads:
+                if read != name or context == "shape":
+                    continue
+                if context is None:
+                    return False
+                positions &= context
+
+            if len(lengths) > 1 or not positions:
+                return False
+
+            loop.split[name] = (lengths.pop(), min(positions))
+
+        return True
+
+    # the block a name is bound in where it is used, and whether it is bound by then rather than further down
+    def binding(self, name):
+        block = self.block
+
+        while block:
+            if name in block.bindings:
+                return block, True
+            if name in block.names:
+                return block, False
+            block = block.parent
+
+        return None, True
+
+    def inside(self, block, loop):
+        while block is not None and block is not loop.block:
+            block = block.parent
+        return block is not None
+
+    # the loops being checked that a name comes from outside of
+    def outside(self, name):
+        if not self.running:
+            return []
+
+        block, bound = self.binding(name)
+        loops = []
+
+        for loop in self.running:
+            if not self.inside(block, loop):
+                loop.names.add(name)
+                loops.append(loop)
+            elif not bound:
+                # declared further down, it is the name from outside until then
+                loop.independent = False
+
+        return loops
+
+    def is_iterator(self, tree, loop):
+        return tree.data == "var" and str(tree.children[0]) == loop.iterator and self.binding(loop.iterator)[0] is loop.block
+
+    def positions(self, indices, loop):
+        return frozenset(i for i, index in enumerate(indices) if self.is_iterator(index, loop))
+
+    def read(self, name, context):
+        for loop in self.outside(name):
+            loop.reads.append((name, context if context in [None, "shape"] else self.positions(context, loop)))
+
+    def declare(self, name, symbol, block=None):
+        # the iterator redeclared in the loop's own scope
+        for loop in self.running:
+            if name == loop.iterator and (block or self.block) is loop.block:
+                loop.independent = False
+
+        return super().declare(name, symbol, block)
+
+    def define(self, stmt):
+        self.taint()
+        super().define(stmt)
+
+    def stmt_assignment(self, node):
+        name = str(node.children[0])
+
+        for loop in self.outside(name):
+            loop.independent = False
+
+        for loop in self.running:
+            if name == loop.iterator and self.binding(name)[0] is loop.block:
+                loop.independent = False
+
+        super().stmt_assignment(node)
+
+    def stmt_index_assignment(self, node):
+        name, indices = str(node.children[0]), node.children[1].children
+
+        for loop in self.outside(name):
+            loop.writes.setdefault(name, []).append((len(indices), self.positions(indices, loop)))
+
+        super().stmt_index_assignment(node)
+
+    def stmt_array_update(self, stmt):
+        for loop in self.outside(str(stmt.children[0])):
+            loop.independent = False
+
+        super().stmt_array_update(stmt)
+
+    stmt_fill = stmt_sort = stmt_copy = stmt_array_update
+
+    def stmt_output(self, stmt):
+        self.taint()
+        super().stmt_output(stmt)
+
+    def stmt_input(self, stmt):
+        self.taint()
+        super().stmt_input(stmt)
+
+    def stmt_call_procedure(self, stmt):
+        self.taint()
+        super().stmt_call_procedure(stmt)
+
+    def stmt_return_stmt(self, stmt):
+        self.taint()
+        super().stmt_return_stmt(stmt)
+
+    def stmt_switch(self, stmt):
+        self.read(str(stmt.children[0].children[0]), None)
+        super().stmt_switch(stmt)
+
+    def expr_call_function(self, tree):
+        self.taint()
+        return super().expr_call_function(tree)
+
+    def expr_hoisted(self, tree):
+        return self.expr(tree.children[0])
+
+    def expr_var(self, tree):
+        self.read(str(tree.children[0]), self.contexts.pop(id(tree), None))
+        return super().expr_var(tree)
+
+    def expr_get_index(self, tree):
+        if tree.children[0].data == "var":
+            self.contexts.setdefault(id(tree.children[0]), tree.children[1].children)
+
+        return super().expr_get_index(tree)
+
+    def expr_length(self, tree):
+        value = tree.children[0]
+
+        # the size of an array, or of one of its rows, doesn't change with what is in its cells
+        if value.data == "get_index":
+            value = value.children[0]
+        if value.data == "var":
+            self.contexts[id(value)] = "shape"
+
+        return super().expr_length(tree)
+
+# the flat slices of an array's storage that a part of a loop writes to: the elements, rows or columns its iterations index
+def owned(shape, position, iterations):
+    size, width = shape[position], shape[1] if len(shape) > 1 else 1
+
+    if position == 0 and abs(iterations.step) == 1:
+        first, last = max(1, min(iterations[0], iterations[-1])), min(size, max(iterations[0], iterations[-1]))
+
+        if first <= last:
+            yield slice((first - 1) * width, last * width)
+        return
+
+    for i in iterations:
+        if 1 <= i <= size:
+            yield slice(i - 1, i) if len(shape) == 1 else slice((i - 1) * width, i * width) if position == 0 else slice(i - 1, None, width)
+
+# an array's storage copied into shared memory, which the workers copy out of and write the cells they own back to
+class SharedArray:
+    def __init__(self, value):
+        self.type, self.shape, self.typecode = value.type, value.shape, getattr(value.data, "typecode", None)
+
+        with memoryview(value.data) as data, data.cast("B") as raw:
+            self.size = len(raw)
+            self.memory = shared_memory.SharedMemory(create=True, size=max(1, self.size))
+            self.memory.buf[:self.size] = raw
+
+    def load(self):
+        with self.memory.buf[:self.size] as raw:
+            if self.typecode is None:
+                data = bytearray(raw)
+            else:
+                data = array(self.typecode)
+                data.frombytes(raw)
+
+        return Array(self.type, self.shape, data)
+
+    def store(self, value, position, iterations):
+        # storage that had to change to fit a value can't be written back
+        if value.shape != self.shape or getattr(value.data, "typecode", None) != self.typecode or value.data.__class__ not in [array, bytearray]:
+            return False
+
+        if not self.size:
+            return True
+
+        with self.memory.buf[:self.size] as raw, raw.cast(self.typecode or "B") as view:
+            for cells in owned(self.shape, position, iterations):
+                view[cells] = value.data[cells]
+
+        return True
+
+    def save(self, value):
+        with memoryview(value.data) as data, data.cast("B") as raw, self.memory.buf[:self.size] as shared:
+            raw[:] = shared
+
+    def release(self):
+        self.memory.close()
+        self.memory.unlink()
+
+# runs part of a loop in a worker, on copies of the variables it uses from outside, and gives back whether all of
+# it ran. anything that stops it is left for the loop to run into again where it started
+def work(engine, file, code, tree, iterations, variables, split):
+    runner, shared = engine(file, code, True), {}
+
+    try:
+        for name, type, mutable, value in variables:
+            if isinstance(value, SharedArray):
+                shared[name], value = value, value.load()
+
+            runner.scope.define(name, Variable(TYPES[type], value, mutable))
+
+        runner.run_loop(tree, iterations)
+
+        return all(shared[name].store(runner.scope.get(name), position, iterations) for name, (_, position) in split.items())
+    except (Exception, SystemExit):
+        return False
+    finally:
+        for value in shared.values():
+            value.memory.close()
+
+# splits the independent FOR loops across worker processes, in contiguous parts so the result is the same as running
+# them in order. only the interpreter and compiled engines split loops, and not while counting steps or memory
+class Parallel:
+    def __init__(self, workers):
+        self.workers = workers
+
+        # the loops that can be split, by the id of their node
+        self.loops = {}
+
+        # started the first time a loop is split
+        self.pool = None
+
+    def analyse(self, file, code, tree):
+        try:
+            self.loops = Independence(file, code).independent(tree)
+        except CheckError:
+            # the program is left to run into its type error, in order
+            self.loops = {}
+
+    # runs the iterations of a loop, some of them here first to time them, then the rest in parts when that is worth it.
+    # iterate runs iterations in the engine the loop started in
+    def run(self, engine, tree, iterations, iterate):
+        if engine.limits is not None:
+            return iterate(iterations)
+
+        start, done, size = time.perf_counter(), 0, 1
+
+        while done < len(iterations):
+            iterate(iterations[done:done + size])
+            done, size = done + size, size * 2
+
+            if time.perf_counter() - start >= PROBE_TIME:
+                break
+
+        rest = iterations[done:]
+
+        if len(rest) < 2 or (time.perf_counter() - start) / done * len(rest) < MIN_TIME or not self.split(engine, self.loops[id(tree)], tree, rest):
+            return iterate(rest)
+
+    def split(self, engine, loop, tree, iterations):
+        variables, shared, results = [], {}, []
+
+        try:
+            for name in loop.names:
+                cell = engine.scope.cells.get(name)
+                var = cell[-1] if cell else None
+
+                if not isinstance(var, Variable) or type(var.value) not in VALUES:
+                    return False
+
+                value = var.value
+
+                if name in loop.split:
+                    if type(value) is not Array or len(value.shape) != loop.split[name][0] or value.data.__class__ not in [array, bytearray]:
+                        return False
+
+                    # copy on write, like any other write to an array shared with an argument
+                    if value.shared:
+                        value = var.value = value.own()
+
+                if type(value) is Array and value.data.__class__ in [array, bytearray]:
+                    shared[name] = (SharedArray(value), value)
+                    value = shared[name][0]
+
+                variables.append((name, var.type.name, var.mutable, value))
+
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers, get_context())
+
+            size = -(-len(iterations) // self.workers)
+            parts = [iterations[i:i + size] for i in range(0, len(iterations), size)]
+
+            args = (type(engine), engine.file, engine.code, tree)
+            results += [self.pool.submit(work, *args, part, variables, loop.split) for part in parts]
+
+            if not all([result.result() for result in results]):
+                return False
+
+            for name in loop.split:
+                memory, value = shared[name]
+                memory.save(value)
+
+            return True
+        except BrokenProcessPool:
+            self.pool = None
+            return False
+        except Exception:
+            # anything that keeps the loop from being split, like a value that can't be sent, leaves it to run here
+            return False
+        finally:
+            # every part has to be done with the shared memory before it goes
+            wait(results)
+
+            for memory, _ in shared.values():
+                memory.release()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
\ No newline at end of file
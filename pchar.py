@@ -1,34 +1,70 @@
 # blame python
+# CHARs are interned, every character has the one instance, so two CHARs are equal only when they are the same object
 class PChar:
-    def __init__(self, value):
-        if isinstance(value, PChar):
-            self._char = value._char
-        elif isinstance(value, int):
+    __slots__ = ("_char",)
+
+    def __new__(cls, value):
+        if value.__class__ is PChar:
+            return value
+
+        if isinstance(value, int):
             try:
-                self._char = chr(value)
+                value = chr(value)
             except:
                 raise Exception(f'Integer "{value}" out of range for CHAR: {value}')
         elif isinstance(value, str):
             assert len(value) == 1, f"CHAR must be a single character, got '{value}'"
-            self._char = value
-        
         else:
             raise Exception(f'Cannot convert "{value}" to "CHAR"')
-    
+
+        char = INTERNED.get(value)
+
+        if char is None:
+            char = INTERNED[value] = object.__new__(cls)
+            char._char = str(value)
+
+        return char
+
+    # copies and pickles come back as the interned instance
+    def __reduce__(self):
+        return PChar, (self._char,)
+
     def __str__(self):
         return self._char
-    
+
     def __repr__(self):
         return repr(self._char)
-    
+
     def __int__(self):
         return ord(self._char)
-    
+
     def __eq__(self, other):
-        if isinstance(other, PChar):
-            return self._char == other._char
-        
+        if other.__class__ is PChar:
+            return self is other
+
         if isinstance(other, str) and len(other) == 1:
             return self._char == other
-        
-        return False
\ No newline at end of file
+
+        return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    # equal to the single character STRING it holds, so it hashes the same
+    def __hash__(self):
+        return hash(self._char)
+
+    def __lt__(self, other):
+        return self._char < other._char if other.__class__ is PChar else NotImplemented
+
+    def __le__(self, other):
+        return self._char <= other._char if other.__class__ is PChar else NotImplemented
+
+    def __gt__(self, other):
+        return self._char > other._char if other.__class__ is PChar else NotImplemented
+
+    def __ge__(self, other):
+        return self._char >= other._char if other.__class__ is PChar else NotImplemented
+
+# every CHAR made so far, by its character
+INTERNED = {}
\ No newline at end of file
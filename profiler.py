@@ -0,0 +1,106 @@
+import time
+
+# parse tree nodes that are whole statements, their time is charged to the line they start on
+STATEMENTS = {
+    "statement", "output", "input", "fill", "sort", "copy", "conditional", "switch",
+    "while_loop", "repeat_until", "for_loop", "procedure", "call_procedure", "function", "return_stmt"
+}
+
+# subroutine calls kept apart in the collapsed stacks
+MAX_FRAMES = 128
+
+# hits, self time and cumulative time of a line or subroutine, plus how many times it is running right now
+class Entry:
+    __slots__ = ("hits", "own", "total", "active")
+
+    def __init__(self):
+        self.hits = self.own = self.total = self.active = 0
+
+# times every statement and subroutine call, engines only route through it when profiling is on
+class Profiler:
+    def __init__(self, file):
+        self.file = file
+        self.clock = time.perf_counter_ns
+
+        self.lines, self.subroutines = {}, {}
+
+        # self time of each distinct stack of subroutines (ending in a line), for flamegraphs
+        self.stacks = {}
+
+        # running lines and calls as [entry, stack, start, time spent in nested ones, is a call]
+        self.frames = []
+        self.paths = [file]
+
+    def line(self, line):
+        entry = self.lines.get(line)
+        if entry is None:
+            entry = self.lines[line] = Entry()
+
+        self.enter(entry, f"{self.paths[-1]};line {line}", False)
+
+    def call(self, name):
+        entry = self.subroutines.get(name)
+        if entry is None:
+            entry = self.subroutines[name] = Entry()
+
+        # calls nested deeper than MAX_FRAMES share the stack of the last one that fit
+        self.paths.append(f"{self.paths[-1]};{name}" if len(self.paths) <= MAX_FRAMES else self.paths[-1])
+        self.enter(entry, self.paths[-1], True)
+
+    def enter(self, entry, stack, call):
+        entry.hits += 1
+        entry.active += 1
+        self.frames.append([entry, stack, self.clock(), 0, call])
+
+    def leave(self):
+        entry, stack, start, nested, call = self.frames.pop()
+        elapsed = self.clock() - start
+
+        entry.own += elapsed - nested
+        entry.active -= 1
+
+        # recursive calls are only counted once towards the cumulative time
+        if not entry.active:
+            entry.total += elapsed
+
+        self.stacks[stack] = self.stacks.get(stack, 0) + elapsed - nested
+
+        if self.frames:
+            self.frames[-1][3] += elapsed
+
+        if call:
+            self.paths.pop()
+
+    # wraps compiled code so it is timed as a line or call
+    def timed(self, run, line=None, name=None):
+        enter = (lambda: self.line(line)) if name is None else (lambda: self.call(name))
+        leave = self.leave
+
+        def wrapper():
+            enter()
+
+            try:
+                return run()
+            finally:
+                leave()
+        return wrapper
+
+    def listing(self, code):
+        rows = [f"{'hits':>9} {'self ms':>10} {'cum ms':>10}  {'line':>5}  source"]
+
+        for line, text in enumerate(code.split("\n"), 1):
+            entry = self.lines.get(line)
+            stats = f"{entry.hits:>9} {entry.own / 1e6:>10.3f} {entry.total / 1e6:>10.3f}" if entry else " " * 31
+            rows.append(f"{stats}  {line:>5}  {text}")
+
+        if self.subroutines:
+            rows += ["", f"{'calls':>9} {'self ms':>10} {'cum ms':>10}  subroutine"]
+
+            for name, entry in sorted(self.subroutines.items(), key=lambda item: -item[1].total):
+                rows.append(f"{entry.hits:>9} {entry.own / 1e6:>10.3f} {entry.total / 1e6:>10.3f}  {name}")
+
+        return "\n".join(rows)
+
+    # one "frame;frame;frame microseconds" line per stack, the format flamegraph tools read
+    def collapsed(self):
+        return "\n".join(f"{stack} {round(ns / 1e3)}" for stack, ns in self.stacks.items() if ns >= 500)
\ No newline at end of file
@@ -1,12 +1,46 @@
 import sys
 sys.dont_write_bytecode = True
 
-from lark import Lark
 import argparse
+import importlib
+import io
 import os
+import threading
+import time
+from collections import OrderedDict
 from interpreter import *
+from builtin import resolve_builtins
 
-arg_parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+# engines are imported on demand so a run only pays for the one it uses
+ENGINES = {
+    "interpreter": ("interpreter", "Interpreter"),
+    "compiled": ("compiler", "Compiler"),
+    "transpiled": ("transpiler", "Transpiler")
+}
+
+# subroutine calls recurse on the python stack, so programs run on a thread with room to go deep
+STACK_SIZE = 512 * 2**20
+RECURSION_LIMIT = 10**8
+
+MAX_DEPTH = 100000
+
+# results kept per FUNCTION when memoizing
+MEMO_SIZE = 4096
+
+# prepared programs a Runner keeps for programs it is given again
+PROGRAMS = 256
+
+# a number of bytes, with an optional K, M or G suffix
+def memory_size(text):
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    unit = units.get(text[-1:].upper(), 1)
+
+    try:
+        return int(text[:-1] if unit > 1 else text) * unit
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid memory size "{text}"')
+
+arg_parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter, epilog="run `pseudo.py batch -h` to run many programs and inputs in parallel")
 
 arg_parser.add_argument('file', help="source file to run")
 
@@ -17,16 +51,344 @@ arg_parser.add_argument(
     help="toggle auto newlines when printing"
 )
 
+arg_parser.add_argument(
+    "--engine",
+    choices=ENGINES,
+    default="interpreter",
+    help="execution engine to run the program with"
+)
+
+arg_parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    default=False,
+    help="parse (and transpile) the program again instead of using cached results"
+)
+
+arg_parser.add_argument(
+    "--input",
+    type=argparse.FileType("r"),
+    metavar="FILE",
+    help="read INPUT lines from FILE in bulk, - for stdin\n(by default INPUT reads one line at a time as it is typed)"
+)
+
+arg_parser.add_argument(
+    "--output",
+    type=argparse.FileType("w"),
+    metavar="FILE",
+    help="write the program's output to FILE instead of stdout"
+)
+
+arg_parser.add_argument(
+    "--buffer-size",
+    type=int,
+    default=BUFFER_SIZE,
+    metavar="N",
+    help="characters of output to buffer before writing them out,\n0 to write every OUTPUT straight away"
+)
+
+arg_parser.add_argument(
+    "--max-depth",
+    type=int,
+    default=MAX_DEPTH,
+    metavar="N",
+    help="maximum depth of nested subroutine calls, 0 for no limit besides memory"
+)
+
+arg_parser.add_argument(
+    "--max-steps",
+    type=int,
+    metavar="N",
+    help="stop the program after N loop iterations and subroutine calls (default: no limit)"
+)
+
+arg_parser.add_argument(
+    "--max-memory",
+    type=memory_size,
+    metavar="BYTES",
+    help="stop the program when the arrays it holds would take more than BYTES, eg. 256M\n(default: no limit)"
+)
+
+arg_parser.add_argument(
+    "--no-check",
+    action="store_true",
+    default=False,
+    help="skip the static type check, and check types while the program runs instead"
+)
+
+arg_parser.add_argument(
+    "--no-optimize",
+    action="store_true",
+    default=False,
+    help="run the program as written, without folding constants, removing dead branches\nor hoisting loop-invariant expressions"
+)
+
+arg_parser.add_argument(
+    "--memoize",
+    action="store_true",
+    default=False,
+    help="cache the results of pure FUNCTIONs, which only depend on their arguments\n(transpiled programs are memoized with the compiled engine)"
+)
+
+arg_parser.add_argument(
+    "--memo-size",
+    type=int,
+    default=MEMO_SIZE,
+    metavar="N",
+    help="results to keep per FUNCTION when memoizing, least recently used go first,\n0 for no limit"
+)
+
+arg_parser.add_argument(
+    "--memo-stats",
+    action="store_true",
+    default=False,
+    help="memoize, and print the calls, hits and misses of every memoized FUNCTION to stderr at exit"
+)
+
+arg_parser.add_argument(
+    "--parallel",
+    type=int,
+    metavar="N",
+    help="split FOR loops whose iterations are independent across N worker processes,\nwith the same results as running them in order (transpiled programs run with\nthe compiled engine, and loops run in order when profiling or capping steps or memory)"
+)
+
+arg_parser.add_argument(
+    "--profile",
+    action="store_true",
+    default=False,
+    help="time every line and subroutine, and print an annotated listing to stderr at exit\n(transpiled programs are profiled with the compiled engine)"
+)
+
+arg_parser.add_argument(
+    "--profile-stacks",
+    type=argparse.FileType("w"),
+    metavar="FILE",
+    help="profile the program and write its collapsed stacks to FILE for flamegraph tools"
+)
+
+
+def get_root():
+    return os.path.dirname(sys.executable if getattr(sys, 'frozen', False) else os.path.abspath(__file__))
 
-def get_parser():
-    root = os.path.dirname(sys.executable if getattr(sys, 'frozen', False) else __file__)
-    
-    with open(os.path.join(root, "syntax.lark"), "r") as f:
-        grammar = f.read().strip()
+def get_engine(name):
+    module, engine = ENGINES[name]
+    return getattr(importlib.import_module(module), engine)
 
-    return Lark(grammar, parser='lalr', propagate_positions=True)
+def get_grammar():
+    with open(os.path.join(get_root(), "syntax.lark"), "r") as f:
+        return f.read().strip()
+
+def get_parser(grammar=None):
+    from lark import Lark
+
+    if grammar is None:
+        grammar = get_grammar()
+
+    # the LALR tables are serialized next to the grammar and rebuilt only when it (or lark) changes
+    return Lark(grammar, parser='lalr', propagate_positions=True, cache=os.path.join(get_root(), "syntax.lark.cache"))
+
+def parse(program, no_cache=False):
+    grammar = get_grammar()
+
+    if no_cache:
+        return resolve_builtins(get_parser(grammar).parse(program))
+
+    from cache import tree_path, load_tree, save_tree
+
+    path = tree_path(get_root(), grammar, program)
+    tree = load_tree(path)
+
+    if tree is None:
+        tree = get_parser(grammar).parse(program)
+        save_tree(path, tree)
+
+    return resolve_builtins(tree)
+
+# type errors are reported before the program runs, which leaves out the checks known to pass and runs an optimized tree
+def prepare(tree, file, program, check=True, optimize=True):
+    checked = None
+
+    if check:
+        from checker import Checker, CheckError
+
+        try:
+            checked = Checker(file, program).check(tree)
+        except CheckError as e:
+            raise ProgramExit(file, e.line, e.error, program)
+
+    if optimize:
+        from optimizer import Optimizer
+        Optimizer(file, program).optimize(tree)
+
+    return checked
+
+def get_limits(max_steps=None, max_memory=None):
+    return Limits(max_steps, max_memory) if max_steps or max_memory else None
+
+def run_deep(target):
+    error = []
+
+    def run():
+        try:
+            target()
+        except BaseException as e:
+            error.append(e)
+
+    # both are process wide, a program run in-process gives them back to the host once it is done
+    limit, stack = sys.getrecursionlimit(), threading.stack_size(STACK_SIZE)
+    sys.setrecursionlimit(RECURSION_LIMIT)
+
+    try:
+        # daemonic so an interrupt in the main thread still ends the program
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join()
+    finally:
+        sys.setrecursionlimit(limit)
+        threading.stack_size(stack)
+
+    # errors end the program with sys.exit, which only stops the thread it is raised in
+    if error:
+        raise error[0]
+
+# what run() does, set by keyword or from a dict
+class Options:
+    def __init__(self, engine="interpreter", no_newlines=False, max_depth=MAX_DEPTH, check=True, optimize=True, memoize=False, memo_size=MEMO_SIZE, file="program.pseudo", max_steps=None, max_memory=None):
+        assert engine in ENGINES, f'Unknown engine "{engine}"'
+
+        self.engine, self.no_newlines, self.max_depth = engine, no_newlines, max_depth
+        self.max_steps, self.max_memory = max_steps, max_memory
+        self.check, self.optimize = check, optimize
+        self.memoize, self.memo_size = memoize, memo_size
+
+        # the name errors are reported against
+        self.file = file
+
+# what a program run in-process output, and the error it stopped with (None if it ran to the end) with the line it is on
+class Result:
+    def __init__(self, stdout, error=None, line=None, stats=None):
+        self.stdout = stdout
+        self.error, self.line = error, line
+        self.stats = {} if stats is None else stats
+
+    def __repr__(self):
+        return f"Result(stdout={self.stdout!r}, error={self.error!r}, line={self.line!r}, stats={self.stats!r})"
+
+# a parsed program, checked and optimized, with what the engines derive from it the first time they need it
+class Prepared:
+    def __init__(self, tree, checked):
+        self.tree, self.checked = tree, checked
+
+        # ids of the pure FUNCTIONs, and the transpiled source (False if it can't be transpiled) with and without step counting
+        self.pure, self.sources = None, {}
+
+# runs programs in-process, parsing with one parser and keeping the programs it prepared for runs of the same source.
+# every run gets engines of its own, so nothing in a program's scope or call stack carries over to the next
+class Runner:
+    def __init__(self, size=PROGRAMS):
+        self.parser = get_parser()
+        self.programs, self.size = OrderedDict(), size
+
+    def run(self, source, stdin="", options=None):
+        options = options if isinstance(options, Options) else Options(**(options or {}))
+        program = "\n".join([line.strip() for line in source.split("\n")])
+
+        stdout = io.StringIO()
+        out, inp = Output(stdout, line_buffered=False), Input(io.StringIO(stdin))
+        error = line = None
+
+        stats = {"engine": options.engine, "cached": (program, options.check, options.optimize) in self.programs}
+        start = time.perf_counter()
+
+        try:
+            run_deep(lambda: self.execute(program, options, out, inp))
+        except ProgramExit as e:
+            error, line = e.error, e.line
+        except Exception as e:
+            # parse errors know their line
+            error, line = str(e).splitlines()[0], getattr(e, "line", None)
+        finally:
+            out.flush()
+
+        stats["time"] = time.perf_counter() - start
+        return Result(stdout.getvalue(), error, line, stats)
+
+    def prepare(self, program, options):
+        key = (program, options.check, options.optimize)
+        prepared = self.programs.get(key)
+
+        if prepared is not None:
+            self.programs.move_to_end(key)
+            return prepared
+
+        tree = resolve_builtins(self.parser.parse(program))
+        prepared = Prepared(tree, prepare(tree, options.file, program, options.check, options.optimize))
+
+        self.programs[key] = prepared
+        if len(self.programs) > self.size:
+            self.programs.popitem(False)
+
+        return prepared
+
+    def execute(self, program, options, out, inp):
+        prepared, engine = self.prepare(program, options), options.engine
+        args = (options.file, program, options.no_newlines, options.max_depth, out, inp)
+        limits = get_limits(options.max_steps, options.max_memory)
+
+        memo = None
+        if options.memoize:
+            from memo import Memo
+            memo = Memo(options.memo_size)
+
+            if prepared.pure is None:
+                memo.analyse(options.file, program, prepared.tree)
+                prepared.pure = memo.pure
+
+            memo.pure = prepared.pure
+
+            # like on the command line, memoized programs run with the compiled engine
+            if engine == "transpiled":
+                engine = "compiled"
+
+        if engine == "transpiled":
+            from transpiler import Transpiler, TranspileError
+
+            transpiler = Transpiler(*args, limits=limits)
+            source = prepared.sources.get(transpiler.counted)
+
+            if source is None:
+                try:
+                    source = transpiler.transpile(prepared.tree)
+                except TranspileError:
+                    source = False
+
+                prepared.sources[transpiler.counted] = source
+
+            if source:
+                transpiler.run(source)
+                return
+
+            engine = "compiled"
+
+        get_engine(engine)(*args, None, prepared.checked, memo, limits).visit(prepared.tree)
+
+# the Runner shared by every call of run(), made on the first one
+runner = None
+
+# runs a program in-process, eg. run(source, "3\n4", {"engine": "compiled"}).stdout
+def run(source, stdin="", options=None):
+    global runner
+
+    if runner is None:
+        runner = Runner()
+
+    return runner.run(source, stdin, options)
 
 def main():    
+    if sys.argv[1:2] == ["batch"]:
+        from batch import main as batch
+        return batch(sys.argv[2:])
+
     args = arg_parser.parse_args()
     file_path = args.file
 
@@ -36,12 +398,69 @@ def main():
         assert file_path[::-1].startswith(ext[::-1]), f'File must have "{ext}" extension'
 
         with open(os.path.join(os.getcwd(), file_path), "r") as f:
-            program = "\n".join([line.strip() for line in f.read().split("\n")])
+            source = f.read()
+            program = "\n".join([line.strip() for line in source.split("\n")])
+
+        source_path, file_path = file_path, os.path.basename(file_path)
+
+        out, inp = Output(args.output, args.buffer_size), Input(args.input)
+
+        profiler = Profiler(file_path) if args.profile or args.profile_stacks else None
+        limits = get_limits(args.max_steps, args.max_memory)
+        if profiler is not None and args.engine == "transpiled":
+            args.engine = "compiled"
+
+        memo = None
+        if args.memoize or args.memo_stats:
+            from memo import Memo
+            memo = Memo(args.memo_size)
+
+        if memo is not None and args.engine == "transpiled":
+            args.engine = "compiled"
+
+        # a profile times every line in this process, so profiled loops are never split
+        parallel = None
+        if args.parallel and profiler is None:
+            from parallel import Parallel
+            parallel = Parallel(args.parallel)
+
+            if args.engine == "transpiled":
+                args.engine = "compiled"
+
+        def prepared(tree):
+            checked = prepare(tree, file_path, program, not args.no_check, not args.no_optimize)
+
+            if memo is not None:
+                memo.analyse(file_path, program, tree)
+            if parallel is not None:
+                parallel.analyse(file_path, program, tree)
+
+            return checked
+
+        try:
+            if args.engine == "transpiled":
+                from transpiler import run_file
+                check = None if args.no_check else lambda tree: prepare(tree, file_path, program, optimize=False)
+                run_deep(lambda: run_file(source_path, file_path, program, args.no_newlines, lambda program: parse(program, args.no_cache), not args.no_cache, args.max_depth, out, inp, prepared, not args.no_optimize, limits, check))
+            else:
+                ast = parse(program, args.no_cache)
+
+                def run():
+                    engine = get_engine(args.engine)(file_path, program, args.no_newlines, args.max_depth, out, inp, profiler, prepared(ast), memo, limits, parallel)
+                    engine.visit(ast)
+                run_deep(run)
+        finally:
+            # also reached on errors, so everything output before one still shows up ahead of it
+            out.flush()
 
-        file_path = os.path.basename(file_path)
-        
-        ast = get_parser().parse(program)
-        Interpreter(file_path, program, args.no_newlines).visit(ast)
+            if args.profile:
+                print(profiler.listing(source), file=sys.stderr)
+            if args.profile_stacks:
+                args.profile_stacks.write(profiler.collapsed())
+            if args.memo_stats:
+                print(memo.stats(), file=sys.stderr)
+            if parallel is not None:
+                parallel.close()
     except FileNotFoundError:
         print(f'Could not locate file: "{file_path}"')
     except Exception as e:
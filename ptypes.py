@@ -1,9 +1,249 @@
+import operator
+from array import array
+from itertools import repeat
 from pchar import *
 from subroutine import *
 
 def type_repr(main_type, sub_type=None):
     return main_type + (f"<{sub_type}>" if sub_type else "")
 
+# compact storage for arrays of these types, elements are read back through the decoder
+STORAGE = {
+    "INTEGER": lambda size: array("q", bytes(8 * size)),
+    "REAL": lambda size: array("d", bytes(8 * size)),
+    "BOOLEAN": bytearray,
+    "CHAR": bytearray
+}
+
+BOOLS = (False, True)
+CHARS = [PChar(i) for i in range(256)]
+
+# how elements go in and out of each type's storage, CHARs past latin-1 are kept as full code points instead
+CODECS = {
+    ("BOOLEAN", bytearray): (BOOLS.__getitem__, None),
+    ("CHAR", bytearray): (CHARS.__getitem__, int),
+    ("CHAR", array): (PChar, int)
+}
+
+# arrays keep their elements in one flat, row-major store of the declared element type.
+# they are passed by value, the copies share storage until one of them is written to
+class Array:
+    # weakly referable so the memory a declared array holds can be given back when it goes
+    __slots__ = ("type", "shape", "data", "shared", "decode", "encode", "__weakref__")
+
+    def __init__(self, type=None, shape=(0,), data=None):
+        self.type, self.shape, self.shared = type, shape, False
+
+        if data is None:
+            size = shape[0] * shape[1] if len(shape) > 1 else shape[0]
+            data = STORAGE[type](size) if type in STORAGE else [TYPES[type].default if type else None] * size
+
+        self.data = data
+        self.decode, self.encode = CODECS.get((type, data.__class__), (None, None))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, i):
+        if len(self.shape) > 1:
+            # a row is a copy, it can only be read or passed by value anyway
+            cols = self.shape[1]
+            return Array(self.type, self.shape[1:], self.data[i * cols:(i + 1) * cols])
+
+        value = self.data[i]
+        return value if self.decode is None else self.decode(value)
+
+    def get(self, i):
+        value = self.data[i]
+        return value if self.decode is None else self.decode(value)
+
+    def put(self, i, value):
+        try:
+            self.data[i] = value if self.encode is None else self.encode(value)
+        except (OverflowError, ValueError):
+            if self.type == "CHAR" and self.data.__class__ is bytearray and value.__class__ is PChar:
+                self.data, self.decode = array("I", iter(self.data)), PChar
+                self.data[i] = int(value)
+                return
+
+            # the value does not fit the compact storage, fall back to a list
+            self.data = self.values()
+            self.decode = self.encode = None
+            self.data[i] = value
+
+    def values(self):
+        return [*self.data] if self.decode is None else [*map(self.decode, self.data)]
+
+    def elements(self):
+        return self.data if self.decode is None else map(self.decode, self.data)
+
+    @staticmethod
+    def build(type, shape, values):
+        # packs the values into compact storage where it can hold them
+        try:
+            if type in ["INTEGER", "REAL"]:
+                values = array("q" if type == "INTEGER" else "d", values)
+            elif type == "BOOLEAN":
+                values = bytearray(map(int, values))
+            elif type == "CHAR":
+                codes = [*map(int, values)]
+                values = array("I", codes) if codes and max(codes) > 255 else bytearray(codes)
+        except (OverflowError, ValueError, TypeError):
+            pass
+
+        return Array(type, shape, values)
+
+    def tolist(self):
+        if len(self.shape) > 1:
+            return [row.tolist() for row in self]
+        return self.values()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    # writes the same text as repr, a chunk of elements at a time
+    def write(self, write, chunk=1024):
+        write("[")
+
+        if len(self.shape) > 1:
+            for i in range(len(self)):
+                if i:
+                    write(", ")
+                self[i].write(write, chunk)
+        else:
+            for start in range(0, len(self.data), chunk):
+                part = self.data[start:start + chunk]
+
+                if start:
+                    write(", ")
+                write(repr([*part] if self.decode is None else [*map(self.decode, part)])[1:-1])
+
+        write("]")
+
+    def __eq__(self, other):
+        return isinstance(other, Array) and self.tolist() == other.tolist()
+
+    def __lt__(self, other):
+        return self.tolist() < other.tolist() if isinstance(other, Array) else NotImplemented
+
+    def __le__(self, other):
+        return self.tolist() <= other.tolist() if isinstance(other, Array) else NotImplemented
+
+    def __gt__(self, other):
+        return self.tolist() > other.tolist() if isinstance(other, Array) else NotImplemented
+
+    def __ge__(self, other):
+        return self.tolist() >= other.tolist() if isinstance(other, Array) else NotImplemented
+
+    # arithmetic applies element by element, to same-shaped arrays or an array and a single value
+    def elementwise(self, op, other, reflected=False):
+        if isinstance(other, Array):
+            if other.shape != self.shape:
+                return NotImplemented
+            other = other.elements()
+        elif isinstance(other, (int, float, str, PChar)):
+            other = repeat(other)
+        else:
+            return NotImplemented
+
+        values = [*map(op, other, self.elements())] if reflected else [*map(op, self.elements(), other)]
+        return Array.build(get_type(values[0]) if values else self.type, self.shape, values)
+
+    def __add__(self, other):
+        return self.elementwise(operator.add, other)
+
+    def __sub__(self, other):
+        return self.elementwise(operator.sub, other)
+
+    def __mul__(self, other):
+        return self.elementwise(operator.mul, other)
+
+    def __truediv__(self, other):
+        return self.elementwise(operator.truediv, other)
+
+    def __mod__(self, other):
+        return self.elementwise(operator.mod, other)
+
+    def __radd__(self, other):
+        return self.elementwise(operator.add, other, True)
+
+    def __rsub__(self, other):
+        return self.elementwise(operator.sub, other, True)
+
+    def __rmul__(self, other):
+        return self.elementwise(operator.mul, other, True)
+
+    def __rtruediv__(self, other):
+        return self.elementwise(operator.truediv, other, True)
+
+    def __rmod__(self, other):
+        return self.elementwise(operator.mod, other, True)
+
+    def __neg__(self):
+        values = [*map(operator.neg, self.elements())]
+        return Array.build(get_type(values[0]) if values else self.type, self.shape, values)
+
+    # whole-array builtins, each runs as one pass over the storage
+    def sum(self):
+        assert self.type in ["INTEGER", "REAL"], f'Cannot apply SUM() to "{get_type(self)}"'
+        return sum(self.data, TYPES[self.type].default)
+
+    def extreme(self, pick):
+        if self.type == "CHAR" and self.decode is None:
+            return pick(self.data, key=str)
+
+        value = pick(self.data)
+        return value if self.decode is None else self.decode(value)
+
+    def min(self):
+        return self.extreme(min)
+
+    def max(self):
+        return self.extreme(max)
+
+    def index_of(self, value):
+        assert len(self.shape) == 1, f'Cannot apply INDEXOF() to "{get_type(self)}"'
+        assert type(value) == TYPES[self.type].bind, f'Expected "{self.type}" argument type, got "{get_type(value)}"'
+
+        try:
+            return self.data.index(value if self.encode is None else self.encode(value)) + 1
+        except ValueError:
+            return 0
+
+    # the builtins that change an array build new storage, leaving any shared copy untouched
+    def filled(self, value):
+        assert type(value) == TYPES[self.type].bind, f'Assignment type mismatch, expected "{self.type}", got "{get_type(value)}"'
+
+        cell = Array(self.type, (1,))
+        cell.put(0, value)
+
+        return Array(self.type, self.shape, cell.data * len(self.data))
+
+    def sorted(self):
+        assert len(self.shape) == 1, f'Cannot apply SORT() to "{get_type(self)}"'
+
+        values = sorted(self.data, key=str if self.type == "CHAR" and self.decode is None else None)
+        return Array(self.type, self.shape, array(self.data.typecode, values) if isinstance(self.data, array) else self.data.__class__(values))
+
+    def copy_from(self, source):
+        assert isinstance(source, Array) and get_type(source) == get_type(self), f'Cannot copy "{get_type(source)}" to "{get_type(self)}"'
+        assert source.shape == self.shape, "Array sizes do not match"
+
+        return source.share()
+
+    def get_type(self):
+        return type_repr("ARRAY", type_repr("ARRAY", self.type) if len(self.shape) > 1 else self.type)
+
+    def share(self):
+        self.shared = True
+        return self
+
+    def own(self):
+        return Array(self.type, self.shape, self.data[:])
+
 class Type:
     def __init__(self, name, bind, default):
         self.name, self.bind, self.default = name, bind, default
@@ -17,7 +257,7 @@ TYPES = {
         Type("STRING", str, ""),
         Type("BOOLEAN", bool, False),
         Type("CHAR", PChar, PChar("\x00")),
-        Type("ARRAY", list, [])
+        Type("ARRAY", Array, Array())
     ]
 }
 
@@ -27,6 +267,13 @@ def get_type(value):
     if raw_type in [Procedure, Function]:
         return raw_type.__name__.upper()
 
+    if raw_type is Array and value.type:
+        return value.get_type()
+
     for i, _ in TYPES.items():
         if raw_type == TYPES[i].bind:
-            return type_repr(i, get_type(value[0]) if i == "ARRAY" else None)
\ No newline at end of file
+            return type_repr(i, get_type(value[0]) if i == "ARRAY" else None)
+
+def bulk(name, value):
+    assert isinstance(value, Array), f'Cannot apply {name}() to "{get_type(value)}"'
+    return value
\ No newline at end of file
@@ -1,53 +1,147 @@
 from ptypes import *
 
 class Variable:
+    __slots__ = ("type", "value", "mutable", "subtype")
+
     def __init__(self, type, value, mutable, subtype=None):
         self.type, self.value, self.mutable = type, value, mutable
         self.subtype = subtype
 
-# for variable scopes
+# a STRING variable being appended to, which keeps the parts until its value is read and joins them then
+class Builder(Variable):
+    __slots__ = ()
+
+    # the slot other variables keep their value in
+    parts = Variable.value
+
+    @property
+    def value(self):
+        parts = self.parts
+
+        if len(parts) > 1:
+            parts[:] = ["".join(parts)]
+
+        return parts[0]
+
+    @value.setter
+    def value(self, value):
+        self.parts = [value]
+
+# for variable scopes, every name has a cell holding its live bindings (innermost last),
+# so lookups never walk the scope stack while still seeing the caller's variables
 class Scope:
     def __init__(self):
+        self.cells = {}
+
+        # the names bound by each open scope, None until it binds one
         self.stack = [{}]
 
+    def cell(self, name):
+        # cells are never removed, so they can be resolved once and kept
+        cell = self.cells.get(name)
+
+        if cell is None:
+            cell = self.cells[name] = []
+
+        return cell
+
     def get(self, name):
-        for scope in self.stack[::-1]:
-            if name in scope:
-                return getattr(scope[name], "value", scope[name])
+        cell = self.cells.get(name)
+
+        if cell:
+            return getattr(cell[-1], "value", cell[-1])
         
         raise Exception(f'Variable "{name}" is not defined')
     
     def define(self, name, variable):
-        self.stack[-1][name] = variable
+        scope, cell = self.stack[-1], self.cell(name)
+
+        if scope is None:
+            scope = self.stack[-1] = {}
+
+        if name in scope:
+            cell[-1] = variable
+        else:
+            scope[name] = None
+            cell.append(variable)
 
     def assign(self, name, value):
-        for scope in self.stack[::-1]:
-            if name in scope:
-                assert scope[name].type.name != "ARRAY", f'Cannot assign to "{get_type(scope[name].value)}"'
-                assert isinstance(scope[name], Variable), f'Cannot assign to "{str(scope[name])}"'
-                assert scope[name].mutable, f'Cannot assign to constant "{name}"'
-                assert type(value) == scope[name].type.bind, f'Assignment type mismatch, expected "{get_type(scope[name].value)}", got "{get_type(value)}"'
-                
-                scope[name].value = value
-                return
-            
-        raise Exception(f'Variable "{name}" is not declared')
+        cell = self.cells.get(name)
+
+        if not cell:
+            raise Exception(f'Variable "{name}" is not declared')
+
+        self.store(cell[-1], name, value)
+
+    def set(self, name, value):
+        # for assignments the static checker proved well typed
+        cell = self.cells.get(name)
+
+        if not cell:
+            raise Exception(f'Variable "{name}" is not declared')
+
+        cell[-1].value = value
+
+    # appends to a STRING variable without copying what it holds so far, False if the name isn't bound to one
+    def append(self, name, text):
+        cell = self.cells[name]
+        var = cell[-1]
+
+        if var.__class__ is Variable:
+            if var.type.name != "STRING" or not var.mutable:
+                return False
+
+            var = cell[-1] = Builder(var.type, var.value, True)
+        elif var.__class__ is not Builder:
+            return False
+
+        var.parts.append(text)
+        return True
+
+    @staticmethod
+    def store(var, name, value):
+        assert var.type.name != "ARRAY", f'Cannot assign to "{get_type(var.value)}"'
+        assert isinstance(var, Variable), f'Cannot assign to "{str(var)}"'
+        assert var.mutable, f'Cannot assign to constant "{name}"'
+        assert type(value) == var.type.bind, f'Assignment type mismatch, expected "{get_type(var.value)}", got "{get_type(value)}"'
+        
+        var.value = value
     
     def assign_index(self, name, indices, value):
-        for scope in self.stack[::-1]:
-            if name in scope:
-                arr = scope[name].value
+        cell = self.cells.get(name)
 
-                if len(indices) > 1:
-                    arr[indices[0]][indices[1]] = value
-                else:
-                    arr[indices[0]] = value
-                return
+        if not cell:
+            raise Exception(f'Array "{name}" is not declared')
 
-        raise Exception(f'Array "{name}" is not declared')
+        self.store_index(cell[-1], indices, value)
+
+    @staticmethod
+    def store_index(var, indices, value):
+        arr = var.value
+
+        # copy on write when the storage is shared with an argument
+        if arr.shared:
+            arr = var.value = arr.own()
+
+        arr.put(indices[0] * arr.shape[1] + indices[1] if len(indices) > 1 else indices[0], value)
+    
+    def update(self, name, value):
+        # rebinds an array to one built by a whole-array builtin
+        cell = self.cells.get(name)
+
+        if not cell:
+            raise Exception(f'Array "{name}" is not declared')
+
+        cell[-1].value = value
     
     def add_scope(self):
-        self.stack.append({})
+        self.stack.append(None)
 
     def remove_scope(self):
-        self.stack.pop()
\ No newline at end of file
+        scope = self.stack.pop()
+
+        if scope:
+            cells = self.cells
+
+            for name in scope:
+                cells[name].pop()
\ No newline at end of file
@@ -6,11 +6,13 @@ class Procedure:
         return f'<{self.__class__.__name__}>'
 
 class Function(Procedure):
-    def __init__(self, return_type, params, code):
+    def __init__(self, return_type, params, code, checked=False, cache=None):
         super().__init__(params, code)
         
         self.return_type = return_type
-    
-class ReturnCall(Exception):
-    def __init__(self, value):
-        self.value = value
\ No newline at end of file
+
+        # every RETURN was statically checked against the return type
+        self.checked = checked
+
+        # results of earlier calls, only pure functions have one when memoization is on
+        self.cache = cache
\ No newline at end of file
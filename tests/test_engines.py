@@ -0,0 +1,79 @@
+import os
+import glob
+import shutil
+import subprocess
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS = os.path.join(ROOT, "tests")
+
+ENGINES = ["interpreter", "compiled", "transpiled"]
+
+# the programs every engine has to run the same way, optimized and checked or as written
+CORPUS = sorted(glob.glob(os.path.join(TESTS, "programs", "*.pseudo")) + glob.glob(os.path.join(ROOT, "examples", "*.pseudo")))
+
+# lines for the programs that INPUT anything
+STDIN = "5\n3\n9\n1\n7\n"
+
+# what pseudo.py prints for a copy of the program in folder, so transpiled modules are cached there and not next to the source
+def run(path, folder, *flags, stdin=STDIN):
+    target = os.path.join(folder, os.path.basename(path))
+
+    if not os.path.exists(target):
+        shutil.copy(path, target)
+
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "pseudo.py"), *flags, "--input", "-", target],
+        input=stdin, capture_output=True, text=True, cwd=folder, timeout=60
+    )
+    return result.stdout + result.stderr
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_same_output(path, tmp_path):
+    expected = run(path, tmp_path, "--engine=interpreter", "--no-optimize", "--no-check")
+
+    for engine in ENGINES:
+        assert run(path, tmp_path, f"--engine={engine}") == expected, engine
+        assert run(path, tmp_path, f"--engine={engine}", "--no-optimize", "--no-check") == expected, engine
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cached_program_is_checked(engine, tmp_path):
+    path = os.path.join(TESTS, "static", "checked.pseudo")
+
+    assert run(path, tmp_path, f"--engine={engine}", "--no-check") == "ran\n"
+
+    # the run above cached the program, without checking it
+    for flags in [[], ["--no-cache"]]:
+        output = run(path, tmp_path, f"--engine={engine}", *flags)
+        assert output.startswith('checked.pseudo:7: Assignment type mismatch, expected "INTEGER", got "STRING"'), output
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("flags", [[], ["--no-optimize", "--no-check"]])
+def test_max_depth(engine, flags, tmp_path):
+    path = os.path.join(TESTS, "programs", "depth.pseudo")
+
+    # calls nested as deep as the cap are fine, one more is not
+    assert run(path, tmp_path, f"--engine={engine}", "--max-depth=50", *flags, stdin="49\n") == "49\n"
+
+    output = run(path, tmp_path, f"--engine={engine}", "--max-depth=50", *flags, stdin="50\n")
+    assert output.startswith("depth.pseudo:9: Maximum recursion depth of 50 exceeded"), output
+
+def test_default_max_depth(tmp_path):
+    path = os.path.join(TESTS, "programs", "depth.pseudo")
+
+    for engine in ENGINES:
+        assert run(path, tmp_path, f"--engine={engine}", stdin="99999\n") == "99999\n", engine
+        assert run(path, tmp_path, f"--engine={engine}", stdin="100000\n").startswith("depth.pseudo:9: Maximum recursion depth of 100000 exceeded"), engine
+
+def test_run_restores_limits():
+    sys.path.insert(0, ROOT)
+    import pseudo
+
+    limit, stack = sys.getrecursionlimit(), threading.stack_size()
+    result = pseudo.run("BEGIN\nOUTPUT MAX(1, 2)\nEND\n")
+
+    assert result.error is not None and result.error.startswith('Function "MAX" is not defined'), result
+    assert (sys.getrecursionlimit(), threading.stack_size()) == (limit, stack)
@@ -0,0 +1,979 @@
+import os
+import math
+import hashlib
+import operator
+import traceback
+from compiler import *
+from checker import *
+
+# bump whenever the generated code changes so stale caches are ignored
+VERSION = 9
+
+CACHE_DIR = "__pseudocache__"
+FILENAME = "<transpiled>"
+
+# the program relies on something the generated code can't express, run it with the compiled engine instead
+class TranspileError(Exception):
+    pass
+
+# raised inside a subroutine, but reported at the line it was called from
+class CallError(Exception):
+    pass
+
+# expressions that are transpiled to a call of a runtime helper
+HELPERS = ["get_index", "length", "array_sum", "array_min", "array_max", "index_of", "type_cast"]
+
+# python frames the runtime helpers may need on top of the deepest subroutine call
+HELPER_DEPTH = 50
+
+DEFAULTS = {
+    "INTEGER": "0",
+    "REAL": "0.0",
+    "STRING": '""',
+    "BOOLEAN": "False",
+    "CHAR": "NUL"
+}
+
+# how many python frames deep the caller is running
+def stack_depth():
+    frame, depth = sys._getframe(1), 0
+    while frame:
+        frame, depth = frame.f_back, depth + 1
+    return depth
+
+# runtime support for the generated code
+def _fail(message, *values):
+    raise Exception(message)
+
+def _undefined(name, *values):
+    raise Exception(f'Variable "{name}" is not defined')
+
+def _binary(op, a, b):
+    try:
+        return op(a, b)
+    except TypeError:
+        raise operation_error(a, b)
+
+def _unsupported(*values):
+    raise operation_error(*values)
+
+def _neg(a):
+    try:
+        return -a
+    except TypeError:
+        raise operation_error(a)
+
+def _check_indices(collection, indices):
+    Interpreter.check_indices(None, collection, indices)
+
+def _get1(value, i):
+    if type(i) is not int or not 0 < i <= len(value):
+        _check_indices(value, [i])
+    return value[i - 1]
+
+def _get2(value, i, j):
+    if type(i) is not int or type(j) is not int or not 0 < i <= len(value) or not 0 < j <= value.shape[1]:
+        _check_indices(value, [i, j])
+    value, decode = value.data[(i - 1) * value.shape[1] + j - 1], value.decode
+    return value if decode is None else decode(value)
+
+def _index(value, indices):
+    assert type(value) in [str, Array], f'Cannot apply indexing to "{get_type(value)}"'
+
+    if len(indices) > 1 and (type(value) is str or len(value.shape) == 1):
+        raise Exception(f'Cannot apply 2D indexing to "{get_type(value)}"')
+
+    return _get2(value, *indices) if len(indices) > 1 else _get1(value, *indices)
+
+def _element(value, expected):
+    if value.__class__ is not TYPES[expected].bind:
+        raise Exception(f'Assignment type mismatch, expected "{expected}", got "{get_type(value)}"')
+    return value
+
+# the setters return the array written to, a private copy if its storage was shared
+def _set1(var, i, value):
+    if type(i) is not int or not 0 < i <= len(var):
+        _check_indices(var, [i])
+    if var.shared:
+        var = var.own()
+    var.put(i - 1, value)
+    return var
+
+def _set2(var, i, j, value):
+    if type(i) is not int or type(j) is not int or not 0 < i <= len(var) or not 0 < j <= var.shape[1]:
+        _check_indices(var, [i, j])
+    if var.shared:
+        var = var.own()
+    var.put((i - 1) * var.shape[1] + j - 1, value)
+    return var
+
+def _set_index(var, indices, value):
+    assert isinstance(var, Array), f'Cannot apply index assignment to "{get_type(var)}"'
+
+    if len(indices) == 1 and len(var.shape) > 1:
+        raise Exception(f'Cannot assign to "{type_repr("ARRAY", var.type)}"')
+
+    if len(indices) > 1 and len(var.shape) == 1:
+        raise Exception(f'Cannot apply 2D indexing to "{get_type(var)}"')
+
+    assert type(value) == TYPES[var.type].bind, f'Assignment type mismatch, expected "{var.type}", got "{get_type(value)}"'
+
+    return _set2(var, *indices, value) if len(indices) > 1 else _set1(var, *indices, value)
+
+def _array(type, *bounds, new=Array):
+    for l, u in bounds:
+        assert isinstance(l, int) and isinstance(u, int), "Array indices must be integers"
+        assert u >= l, "Invalid array bounds"
+        assert l == 1, "Array must be 1-indexed"
+
+    return new(type, tuple(u for _, u in bounds))
+
+_assign = _element
+
+def _arg(value, expected):
+    # pass arrays by value
+    if isinstance(value, Array):
+        value = value.share()
+
+    assert get_type(value) == expected, f'Expected "{expected}" argument type, got "{get_type(value)}"'
+    return value
+
+def _returned(value, expected):
+    if get_type(value) != expected:
+        raise CallError(f'Expected "{expected}" RETURN type, got "{get_type(value)}"')
+    return value
+
+def _range(step, start, stop):
+    stop += -1 if step < 0 else 1
+
+    assert step != 0, "Iteration step cannot be 0"
+    assert all(isinstance(i, int) for i in (start, stop, step)), "Iteration bounds must be integers"
+
+    return range(start, stop, step)
+
+def _length(value):
+    assert type(value) in [str, Array], f'Cannot apply LENGTH() to "{get_type(value)}"'
+    return len(value)
+
+def _sum(value):
+    return bulk("SUM", value).sum()
+
+def _min(value):
+    return bulk("MIN", value).min()
+
+def _max(value):
+    return bulk("MAX", value).max()
+
+def _index_of(value, item):
+    return bulk("INDEXOF", value).index_of(item)
+
+def _fill(var, value):
+    return bulk("FILL", var).filled(value)
+
+def _sort(var):
+    return bulk("SORT", var).sorted()
+
+def _copy(var, source):
+    return bulk("COPY", var).copy_from(source)
+
+def _cast(name, value):
+    try:
+        return TYPES[name].bind(value)
+    except:
+        raise Exception(f'Cannot cast "{get_type(value)}" to "{name}"')
+
+RUNTIME = {
+    name: value for name, value in globals().items() if name.startswith("_") and callable(value) and not name.startswith("__")
+}
+RUNTIME.update(PChar=PChar, NUL=TYPES["CHAR"].default, UNSET=UNSET, operator=operator)
+
+class Binding:
+    def __init__(self, name, py, kind, type, params=None):
+        # kind is "var", "const", "array", "procedure" or "function"
+        self.name, self.py, self.kind, self.type = name, py, kind, type
+        self.params = params
+
+class Transpiler:
+    def __init__(self, file, code, no_newlines, max_depth=None, out=None, inp=None, checked=None, limits=None):
+        self.file, self.code = file, code
+        self.no_newlines = no_newlines
+        self.max_depth = max_depth
+
+        # loops and subroutines only count their steps in code generated for a capped run
+        self.limits = limits
+        self.counted = limits is not None and bool(limits.max_steps)
+
+        # only used when falling back to the compiled engine, the generated code leaves out the checks itself
+        self.checked = checked
+
+        self.runtime = Interpreter(file, code, no_newlines, max_depth, out, inp)
+        self.out, self.inp = self.runtime.out, self.runtime.inp
+
+    def visit(self, tree):
+        try:
+            source = self.transpile(tree)
+        except TranspileError:
+            return Compiler(self.file, self.code, self.no_newlines, self.max_depth, self.out, self.inp, checked=self.checked, limits=self.limits).visit(tree)
+
+        self.run(source)
+        return source
+
+    def run(self, source):
+        namespace = {**RUNTIME, "END": "" if self.no_newlines else "\n", "OUTPUT": self.out.output, "INPUT": self.runtime.read_line}
+
+        # subroutines count the frames they nest in DEPTH, which is capped like in the other engines
+        max_depth = self.max_depth
+
+        def _deep():
+            raise CallError(f"Maximum recursion depth of {max_depth} exceeded")
+
+        namespace.update(DEPTH=0, MAX_DEPTH=max_depth or math.inf, _deep=_deep)
+
+        if self.limits is not None:
+            limits = self.limits
+
+            # running out of steps on entering a subroutine is reported at the call, like any error in its arguments
+            def _call():
+                try:
+                    limits.step()
+                except Exception as e:
+                    raise CallError(str(e)) from None
+
+            namespace.update(_step=limits.step, _call=_call, _array=lambda type, *bounds: _array(type, *bounds, new=limits.array))
+
+        exec(compile(source, FILENAME, "exec"), namespace)
+
+        # each subroutine call is a single python frame, so the stack has room for as many as the depth cap allows
+        limit = sys.getrecursionlimit()
+        if self.max_depth:
+            sys.setrecursionlimit(stack_depth() + self.max_depth + HELPER_DEPTH)
+
+        try:
+            namespace["program"]()
+        except Exception as e:
+            frames = [frame for frame in traceback.extract_tb(e.__traceback__) if frame.filename == FILENAME]
+            line = namespace["LINES"][frames[-2 if isinstance(e, CallError) and len(frames) > 1 else -1].lineno - 1]
+
+            if isinstance(e, NameError) and e.name in namespace["NAMES"]:
+                e = namespace["NAMES"][e.name]
+
+            raise ProgramExit(self.file, line, e, self.code)
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def transpile(self, tree):
+        self.lines, self.indent = [], 0
+        self.constants, self.names = [], {}
+
+        # python names of the globals assigned by the subroutine being emitted
+        self.nonlocals = None
+
+        # binding and python parameters of the FUNCTION being emitted, when its body loops for its tail calls
+        self.tail = None
+
+        # python locals holding the values of hoisted expressions
+        self.invariants = {}
+
+        self.nonglobal = set()
+        for stmt in tree.children:
+            self.collect(stmt)
+
+        self.globals = self.block = Block(None, "global", [name for stmt in tree.children for name in declared(stmt)])
+        self.top = {}
+
+        for stmt in tree.children:
+            for name in declared(stmt):
+                self.top.setdefault(name, stmt)
+
+        self.emit("def program():", 1)
+        self.indent += 1
+        self.statements(tree.children, 1)
+
+        header = [f"# generated from {self.file} by transpiler.py", ""]
+        header += [f"{name} = PChar({value!r})" for name, value in self.constants]
+
+        source = header + [""] + ["    " * indent + text for indent, text, _ in self.lines]
+        lines = [1] * (len(header) + 1) + [line for _, _, line in self.lines]
+
+        return "\n".join(source + ["", f"LINES = {lines!r}", f"NAMES = {self.names!r}", ""])
+
+    def emit(self, text, line):
+        self.lines.append((self.indent, text, line))
+
+    # finds every name declared outside the global scope
+    def collect(self, stmt):
+        for stmts, names in nested(stmt):
+            self.nonglobal.update(names)
+
+            for child in stmts:
+                self.nonglobal.update(declared(child))
+                self.collect(child)
+
+    # scopes
+    def enter(self, kind, stmts=(), names=()):
+        self.block = Block(self.block, kind, [*names, *(name for stmt in stmts for name in declared(stmt))])
+
+    def leave(self):
+        self.block = self.block.parent
+
+    def declare(self, name, kind, type, params=None, block=None):
+        block = block or self.block
+
+        if name in block.bindings:
+            binding = block.bindings[name]
+
+            if (binding.kind, binding.type) != (kind, type):
+                raise TranspileError(f'"{name}" is redeclared with a different type')
+            return binding
+
+        py = self.unique(name)
+        self.names[py] = f'{"Variable" if kind in ["var", "const", "array"] else kind.capitalize()} "{name}" is not defined'
+
+        binding = block.bindings[name] = Binding(name, py, kind, type, params)
+        return binding
+
+    # every generated name ends in a number no other name shares
+    def unique(self, name):
+        self.counter = getattr(self, "counter", 0) + 1
+        return f"{name}_{self.counter}"
+
+    def resolve(self, name):
+        block = self.block
+
+        while block:
+            if name in block.bindings:
+                return block.bindings[name]
+
+            # declared further down a loop body, so it is only visible from the second iteration on
+            if block.kind == "loop" and name in block.names:
+                raise TranspileError(f'"{name}" is declared later in the loop')
+
+            if block.kind == "function":
+                # subroutines see their caller's variables, which are only known statically for globals
+                if name in self.nonglobal:
+                    raise TranspileError(f'"{name}" is resolved through the caller')
+
+                if name in self.globals.bindings:
+                    return self.globals.bindings[name]
+
+                return self.predeclare(name) if name in self.top else None
+
+            block = block.parent
+
+    # binds a global that a subroutine uses before its declaration is reached
+    def predeclare(self, name):
+        stmt = self.top[name]
+
+        if stmt.data == "input":
+            return self.declare(name, "var", "STRING", block=self.globals)
+
+        node = stmt.children[0]
+
+        if node.data == "declaration":
+            return self.declare(name, *self.declaration_type(node), block=self.globals)
+        if node.data in ["procedure", "function"]:
+            return self.declare(name, *self.signature(node), block=self.globals)
+
+        value = node.children[1]
+        if value.data not in ["number", "string", "boolean", "char"]:
+            raise TranspileError(f'Type of constant "{name}" is not known')
+        return self.declare(name, "const", get_type(self.runtime.visit(value)), block=self.globals)
+
+    def declaration_type(self, node):
+        block = node.children[1]
+
+        if not hasattr(block, "data"):
+            return "var", str(block)
+        return "array", "ARRAY<" * len(block.children[:-1]) + str(block.children[-1]) + ">" * len(block.children[:-1])
+
+    def signature(self, node):
+        block = node.children
+        params, offset = self.runtime.get_params(block[1])
+        params = [(name, param.get_type()) for name, param in params.items()]
+
+        if node.data == "procedure":
+            return "procedure", None, params
+        return "function", self.runtime.get_param(block[offset]).get_type(), params
+
+    # statements
+    def statements(self, stmts, line):
+        start = len(self.lines)
+
+        for stmt in stmts:
+            if not self.runtime.check_newline(stmt):
+                self.statement(stmt)
+
+        if len(self.lines) == start:
+            self.emit("pass", line)
+
+    def statement(self, stmt):
+        if stmt.data in COMPOUND:
+            getattr(self, "stmt_" + stmt.data)(stmt.children[0])
+        elif stmt.data != "statement":
+            getattr(self, "stmt_" + stmt.data)(stmt)
+        elif stmt.children[0].data in ["declaration", "constant", "assignment", "index_assignment"]:
+            getattr(self, "stmt_" + stmt.children[0].data)(stmt.children[0])
+        else:
+            self.emit(self.expr(stmt.children[0])[0], stmt.meta.line)
+
+    def stmt_declaration(self, node):
+        name, line = str(node.children[0]), node.meta.line
+        kind, type = self.declaration_type(node)
+
+        if kind == "var":
+            self.emit(f"{self.declare(name, kind, type).py} = {DEFAULTS[type]}", line)
+            return
+
+        bounds = ", ".join(f"({self.expr(l)[0]}, {self.expr(u)[0]})" for l, u in (b.children for b in node.children[1].children[:-1]))
+        self.emit(f"{self.declare(name, kind, type).py} = _array({str(node.children[1].children[-1])!r}, {bounds})", line)
+
+    def stmt_constant(self, node):
+        name, (value, type) = str(node.children[0]), self.expr(node.children[1])
+
+        if not type:
+            raise TranspileError(f'Type of constant "{name}" is not known')
+
+        self.emit(f"{self.declare(name, 'const', type).py} = {value}", node.meta.line)
+
+    def stmt_assignment(self, node):
+        name, line = str(node.children[0]), node.meta.line
+        value, type = self.expr(node.children[1])
+        binding = self.resolve(name)
+
+        if binding is None:
+            self.fail(line, f'Variable "{name}" is not declared', value)
+        elif binding.kind == "const":
+            self.fail(line, f'Cannot assign to constant "{name}"', value)
+        elif binding.kind == "array":
+            self.fail(line, f'Cannot assign to "{binding.type}"', value)
+        elif binding.kind != "var":
+            raise TranspileError(f'Cannot assign to "{name}"')
+        else:
+            if self.nonlocals is not None and self.globals.bindings.get(name) is binding:
+                self.nonlocals.add(binding.py)
+
+            if getattr(node.meta, "append", False) and type == binding.type == "STRING":
+                self.append(binding, node.children[1].children[1], line)
+                return
+
+            self.emit(f"{binding.py} = {value if type == binding.type else f'_assign({value}, {binding.type!r})'}", line)
+
+    # CPython only grows a string in place when nothing else refers to it and it is appended to a local of the
+    # function running, which a variable of an enclosing one isn't. the text is evaluated before that is cleared
+    def append(self, binding, text, line):
+        value, addend = self.unique("text"), self.unique("addend")
+
+        self.emit(f"{value}, {addend}, {binding.py} = {binding.py}, {self.expr(text)[0]}, None", line)
+        self.emit(f"{value} += {addend}", line)
+        self.emit(f"{binding.py} = {value}", line)
+
+    # raises once the given values have been evaluated
+    def fail(self, line, message, *values):
+        self.emit(f"_fail({', '.join([repr(message), *values])})", line)
+
+    def stmt_index_assignment(self, node):
+        name, line = str(node.children[0]), node.meta.line
+        indices = [*map(self.expr, node.children[1].children)]
+        value, type = self.expr(node.children[2])
+        binding = self.resolve(name)
+
+        if binding is None:
+            self.emit(f"_undefined({', '.join([repr(name), *(i for i, _ in indices), value])})", line)
+            return
+        if binding.kind in ["procedure", "function"]:
+            raise TranspileError(f'Cannot index "{name}"')
+
+        # writes may rebind the array to a private copy
+        if self.nonlocals is not None and self.globals.bindings.get(name) is binding:
+            self.nonlocals.add(binding.py)
+
+        element = element_type(binding.type, len(indices)) if binding.kind == "array" else None
+
+        if element is None or element.startswith("ARRAY"):
+            self.emit(f"{binding.py} = _set_index({binding.py}, [{', '.join(i for i, _ in indices)}], {value})", line)
+            return
+
+        if type != element:
+            value = f"_element({value}, {element!r})"
+
+        self.emit(f"{binding.py} = _set{len(indices)}({binding.py}, {', '.join(i for i, _ in indices)}, {value})", line)
+
+    # FILL, SORT and COPY rebind the array to the one the builtin built
+    def stmt_array_update(self, stmt):
+        name, line = str(stmt.children[0]), stmt.meta.line
+        args = [self.expr(child)[0] for child in stmt.children[1:] if not self.runtime.check_newline(child)]
+        binding = self.resolve(name)
+
+        if binding is None:
+            self.emit(f"_undefined({', '.join([repr(name), *args])})", line)
+            return
+        if binding.kind in ["procedure", "function"]:
+            raise TranspileError(f'Cannot update "{name}"')
+
+        if self.nonlocals is not None and self.globals.bindings.get(name) is binding:
+            self.nonlocals.add(binding.py)
+
+        self.emit(f"{binding.py} = _{stmt.data}({', '.join([binding.py, *args])})", line)
+
+    stmt_fill = stmt_sort = stmt_copy = stmt_array_update
+
+    def stmt_output(self, stmt):
+        values = [self.expr(child)[0] for child in stmt.children if not self.runtime.check_newline(child)]
+        self.emit(f"OUTPUT([{', '.join(values)}], END)", stmt.meta.line)
+
+    def stmt_input(self, stmt):
+        self.emit(f"{self.declare(str(stmt.children[0]), 'var', 'STRING').py} = INPUT()", stmt.meta.line)
+
+    def stmt_conditional(self, node):
+        for i, branch in enumerate(node.children):
+            line = branch.meta.line
+
+            if branch.data == "else_branch":
+                self.emit("else:", line)
+            else:
+                self.emit(f"{'if' if i == 0 else 'elif'} {self.expr(branch.children[0])[0]}:", line)
+
+            self.body("block", branch.children[1:], line)
+
+    def stmt_switch(self, node):
+        identifier = Tree("var", [node.children[0]], node.meta)
+        first = True
+
+        for branch in node.children[1:]:
+            if self.runtime.check_newline(branch):
+                continue
+
+            line = branch.meta.line
+
+            if branch.data == "otherwise_branch":
+                self.emit("else:" if not first else "if True:", line)
+                self.body("block", branch.children, line)
+                break
+
+            self.emit(f"{'if' if first else 'elif'} ({self.expr(branch.children[0])[0]}) == {self.expr(identifier)[0]}:", line)
+            self.body("block", branch.children[1:], line)
+            first = False
+
+    def body(self, kind, stmts, line, names=()):
+        self.enter(kind, stmts, names)
+        self.indent += 1
+        self.statements(stmts, line)
+        self.indent -= 1
+        self.leave()
+
+    # the values of the loop's hoisted expressions are cleared each time it starts.
+    # plain arithmetic is cheaper to redo in python than to look up, so only expressions that call a helper are kept
+    def hoist(self, node):
+        for hoisted in getattr(node.meta, "hoisted", ()):
+            if any(subtree.data in HELPERS for subtree in hoisted.iter_subtrees()):
+                self.invariants[id(hoisted)] = self.unique("hoisted")
+                self.emit(f"{self.invariants[id(hoisted)]} = UNSET", node.meta.line)
+
+    def stmt_while_loop(self, node):
+        self.hoist(node)
+        self.enter("loop", node.children[1:])
+
+        self.emit(f"while {self.expr(node.children[0])[0]}:", node.meta.line)
+        self.indent += 1
+        self.step("_step", node.meta.line)
+        self.statements(node.children[1:], node.meta.line)
+        self.indent -= 1
+
+        self.leave()
+
+    def stmt_repeat_until(self, node):
+        block = [line for line in node.children if not self.runtime.check_newline(line)]
+
+        self.hoist(node)
+        self.enter("loop", block[:-1])
+
+        self.emit("while True:", node.meta.line)
+        self.indent += 1
+        self.step("_step", node.meta.line)
+        self.statements(block[:-1], node.meta.line)
+        self.emit(f"if {self.expr(block[-1])[0]}:", block[-1].meta.line)
+        self.emit("    break", block[-1].meta.line)
+        self.indent -= 1
+
+        self.leave()
+
+    def stmt_for_loop(self, node):
+        block = node.children
+        is_step = getattr(block[3], "data", None) == 'step'
+        line = node.meta.line
+
+        # the bounds are evaluated once, before anything in the loop is declared
+        step = self.expr(block[3].children[0])[0] if is_step else "1"
+        (start, start_type), (stop, stop_type) = self.expr(block[1]), self.expr(block[2])
+        value = self.literal(block[3].children[0]) if is_step else 1
+
+        if start_type == stop_type == "INTEGER" and type(value) is int and value != 0:
+            loop = f"range({start}, {stop} {'-' if value < 0 else '+'} 1{'' if value == 1 else f', {value}'})"
+        else:
+            loop = f"_range({step}, {start}, {stop})"
+
+        self.hoist(node)
+        self.enter("loop", block[4:] if is_step else block[3:], [str(block[0])])
+
+        iterator = self.declare(str(block[0]), "var", "INTEGER")
+        self.emit(f"for {iterator.py} in {loop}:", line)
+
+        self.indent += 1
+        self.step("_step", line)
+        self.statements(block[4:] if is_step else block[3:], line)
+        self.indent -= 1
+
+        self.leave()
+
+    def step(self, helper, line):
+        if self.counted:
+            self.emit(f"{helper}()", line)
+
+    def literal(self, tree):
+        if tree.data == "number":
+            return self.runtime.visit(tree)
+        if tree.data == "neg" and tree.children[0].data == "number":
+            return -self.runtime.visit(tree.children[0])
+
+    def stmt_procedure(self, node):
+        self.define(node)
+
+    def stmt_function(self, node):
+        self.define(node)
+
+    def define(self, node):
+        block = node.children
+        name, line = str(block[0]), node.meta.line
+
+        try:
+            kind, type, params = self.signature(node)
+        except AssertionError:
+            raise TranspileError(f'Duplicate parameter name in "{name}"')
+
+        offset = 2 if isinstance(block[1], Tree) and block[1].data == "param_list" else 1
+        body = block[offset + (kind == "function"):]
+
+        binding = self.declare(name, kind, type, params)
+        outer, self.nonlocals = (self.nonlocals, self.tail), set()
+
+        self.enter("function", body, [name for name, _ in params])
+        args = [self.declare(name, "array" if type.startswith("ARRAY") else "var", type).py for name, type in params]
+        self.block.subroutine = binding
+
+        self.emit(f"def {binding.py}({', '.join(args)}):", line)
+        self.indent += 1
+        nonlocals = len(self.lines)
+
+        # the frame is counted until the subroutine returns, whether or not it ran to the end
+        self.emit("global DEPTH", line)
+        self.emit("if DEPTH >= MAX_DEPTH:", line)
+        self.emit("    _deep()", line)
+        self.emit("DEPTH += 1", line)
+        self.emit("try:", line)
+        self.indent += 1
+
+        # a tail call of itself starts the body over with new arguments
+        self.tail = (binding, args) if any(map(tail_calls, body)) else None
+
+        if self.tail:
+            self.emit("while True:", line)
+            self.indent += 1
+
+        self.step("_call", line)
+        self.statements(body, line)
+
+        if kind == "function":
+            self.emit(f"return {DEFAULTS.get(type, '[]')}", line)
+
+        if self.tail:
+            self.indent -= 1
+
+        self.indent -= 1
+        self.emit("finally:", line)
+        self.emit("    DEPTH -= 1", line)
+
+        if self.nonlocals:
+            self.lines.insert(nonlocals, (self.indent, f"nonlocal {', '.join(sorted(self.nonlocals))}", line))
+
+        self.indent -= 1
+        self.leave()
+
+        self.nonlocals, self.tail = outer
+
+    # whether the statement being emitted is inside a loop of the subroutine it is in
+    def looping(self):
+        block = self.block
+
+        while block and block.kind != "function":
+            if block.kind == "loop":
+                return True
+            block = block.parent
+        return False
+
+    def subroutine(self):
+        block = self.block
+
+        while block and block.kind != "function":
+            block = block.parent
+        return block and block.subroutine
+
+    def call(self, name, args, kind):
+        binding = self.resolve(name)
+
+        if binding is None:
+            error = f'{kind.capitalize()} "{name}" is not defined'
+        elif binding.kind not in ["procedure", "function"]:
+            raise TranspileError(f'"{name}" is not a subroutine')
+        elif kind == "procedure" and binding.kind == "function":
+            error = 'Cannot "CALL" Function, directly invoke instead'
+        elif kind == "function" and binding.kind == "procedure":
+            error = f'Cannot directly invoke Procedure "{name}", use "CALL"'
+        elif len(args) != len(binding.params):
+            error = f'Expected {len(binding.params)} arguments, got {len(args)}'
+        else:
+            error = None
+
+        if error:
+            return f"_fail({error!r})", None
+
+        return f"{binding.py}({', '.join(self.arguments(args, binding))})", binding.type
+
+    def arguments(self, args, binding):
+        values = []
+
+        for (value, type), (_, param) in zip(map(self.expr, args), binding.params):
+            if type != param:
+                values.append(f"_arg({value}, {param!r})")
+            elif param.startswith("ARRAY"):
+                values.append(f"{value}.share()")
+            else:
+                values.append(value)
+
+        return values
+
+    def stmt_call_procedure(self, stmt):
+        args = stmt.children[1].children if len([i for i in stmt.children if not self.runtime.check_newline(i)]) > 1 else []
+        self.emit(self.call(str(stmt.children[0]), args, "procedure")[0], stmt.meta.line)
+
+    def stmt_return_stmt(self, stmt):
+        function = self.subroutine()
+        line = stmt.meta.line
+
+        if function is None or function.kind != "function":
+            self.emit("_fail('RETURN statement ouside Function block')", line)
+            return
+
+        if self.tail and self.tail[0] is function and getattr(stmt.meta, "tail", False) and not self.looping():
+            call, (binding, params) = stmt.children[0], self.tail
+            args = call.children[1].children
+
+            if self.resolve(str(call.children[0])) is binding and len(args) == len(params):
+                if params:
+                    self.emit(f"{', '.join(params)} = {', '.join(self.arguments(args, binding))}", line)
+
+                self.emit("continue", line)
+                return
+
+        value, type = self.expr(stmt.children[0])
+        expected = function.type
+
+        self.emit(f"return {value if type == expected else f'_returned({value}, {expected!r})'}", line)
+
+    # expressions, as (code, static type)
+    def expr(self, tree):
+        return getattr(self, "expr_" + tree.data)(tree)
+
+    def expr_number(self, tree):
+        value = self.runtime.visit(tree)
+        return repr(value), get_type(value)
+
+    def expr_string(self, tree):
+        return repr(self.runtime.visit(tree)), "STRING"
+
+    def expr_boolean(self, tree):
+        return repr(self.runtime.visit(tree)), "BOOLEAN"
+
+    def expr_char(self, tree):
+        value = str(self.runtime.visit(tree))
+
+        for name, char in self.constants:
+            if char == value:
+                return name, "CHAR"
+
+        self.constants.append((self.unique("char"), value))
+        return self.constants[-1][0], "CHAR"
+
+    def expr_var(self, tree):
+        name = str(tree.children[0])
+        binding = self.resolve(name)
+
+        if binding is None:
+            return f"_undefined({name!r})", None
+        if binding.kind in ["procedure", "function"]:
+            raise TranspileError(f'Subroutine "{name}" used as a value')
+
+        return binding.py, binding.type
+
+    def expr_binary(self, tree):
+        op = OPERATORS[tree.data]
+        (a, a_type), (b, b_type) = map(self.expr, tree.children)
+        type = result_type(op, a_type, b_type)
+
+        if type is False:
+            return f"_unsupported({a}, {b})", None
+        if type is None:
+            return f"_binary(operator.{op.__name__}, {a}, {b})", None
+
+        return f"({a} {SYMBOLS[tree.data]} {b})", type
+
+    expr_add = expr_sub = expr_mul = expr_div = expr_mod = expr_binary
+    expr_gt = expr_lt = expr_gte = expr_lte = expr_eq = expr_neq = expr_binary
+
+    def expr_neg(self, tree):
+        a, type = self.expr(tree.children[0])
+
+        if type in ["INTEGER", "REAL", "BOOLEAN"]:
+            return f"(-{a})", "REAL" if type == "REAL" else "INTEGER"
+        return f"_neg({a})", None
+
+    def expr_hoisted(self, tree):
+        value, type = self.expr(tree.children[0])
+        py = self.invariants.get(id(tree))
+
+        if py is None:
+            return value, type
+        return f"({py} if {py} is not UNSET else ({py} := {value}))", type
+
+    def expr_not_op(self, tree):
+        return f"(not {self.expr(tree.children[0])[0]})", "BOOLEAN"
+
+    def expr_logical(self, tree):
+        (a, a_type), (b, b_type) = map(self.expr, tree.children)
+        return f"({a} {'and' if tree.data == 'and_op' else 'or'} {b})", a_type if a_type == b_type else None
+
+    expr_and_op = expr_or_op = expr_logical
+
+    def expr_get_index(self, tree):
+        value, type = self.expr(tree.children[0])
+        indices = [*map(self.expr, tree.children[1].children)]
+        args = ", ".join(i for i, _ in indices)
+
+        if type == "STRING" and len(indices) == 1:
+            return f"_get1({value}, {args})", "STRING"
+
+        element = element_type(type, len(indices))
+
+        if element:
+            return f"_get{len(indices)}({value}, {args})", element
+        return f"_index({value}, [{args}])", None
+
+    def expr_length(self, tree):
+        value, type = self.expr(tree.children[0])
+
+        if type == "STRING" or (type or "").startswith("ARRAY"):
+            return f"len({value})", "INTEGER"
+        return f"_length({value})", "INTEGER"
+
+    def expr_array_builtin(self, tree):
+        value, type = self.expr(tree.children[0])
+        element = (type or "").replace("ARRAY<", "").rstrip(">") if (type or "").startswith("ARRAY<") else None
+
+        if tree.data == "array_sum" and element not in ["INTEGER", "REAL"]:
+            element = None
+
+        return f"_{tree.data[6:]}({value})", element
+
+    expr_array_sum = expr_array_min = expr_array_max = expr_array_builtin
+
+    def expr_index_of(self, tree):
+        (value, _), (item, _) = map(self.expr, tree.children)
+        return f"_index_of({value}, {item})", "INTEGER"
+
+    def expr_type_cast(self, tree):
+        cast, (value, _) = str(tree.children[0]), self.expr(tree.children[1])
+
+        if cast == "STRING":
+            return f"str({value})", "STRING"
+        return f"_cast({cast!r}, {value})", cast
+
+    def expr_call_function(self, tree):
+        return self.call(str(tree.children[0]), tree.children[1].children, "function")
+
+# whether a statement has a RETURN the optimizer marked as a tail call of the FUNCTION it is in,
+# outside of any loop so it can continue the loop around the body
+def tail_calls(stmt):
+    if isinstance(stmt, Token) or stmt.data in ["procedure", "function", "while_loop", "repeat_until", "for_loop"]:
+        return False
+    if stmt.data == "return_stmt":
+        return getattr(stmt.meta, "tail", False)
+    return any(map(tail_calls, stmt.children))
+
+SYMBOLS = {
+    "add": "+",
+    "sub": "-",
+    "mul": "*",
+    "div": "/",
+    "mod": "%",
+    "gt": ">",
+    "lt": "<",
+    "gte": ">=",
+    "lte": "<=",
+    "eq": "==",
+    "neq": "!="
+}
+
+# generated modules are cached next to the source, keyed by a hash of the program, whether it was optimized
+# and whether it counts its steps
+def cache_path(path, program, optimized=False, counted=False):
+    digest = hashlib.sha256(f"{VERSION}\n{optimized}\n{counted}\n{program}".encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR, f"{os.path.basename(path)}.{digest}.py")
+
+def load_cache(path, program, optimized=False, counted=False):
+    try:
+        with open(cache_path(path, program, optimized, counted), "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def save_cache(path, program, source, optimized=False, counted=False):
+    target = cache_path(path, program, optimized, counted)
+
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        # only keep the latest version of each program
+        prefix = os.path.basename(path) + "."
+        for name in os.listdir(os.path.dirname(target)):
+            if name.startswith(prefix) and name[len(prefix):].count(".") == 1:
+                os.remove(os.path.join(os.path.dirname(target), name))
+
+        with open(target, "w") as f:
+            f.write(source)
+    except OSError:
+        pass
+
+# prepare is called with the parse tree of a program that isn't cached yet, it can rewrite
+# the tree (which optimized says it does) and returns the nodes the static checker proved.
+# check type checks the tree of a cached program, whose type errors have to be reported all the same
+def run_file(path, file, program, no_newlines, parse, use_cache=True, max_depth=None, out=None, inp=None, prepare=None, optimized=False, limits=None, check=None):
+    transpiler = Transpiler(file, program, no_newlines, max_depth, out, inp, limits=limits)
+    source = load_cache(path, program, optimized, transpiler.counted) if use_cache else None
+
+    if source is not None and check is not None:
+        check(parse(program))
+
+    if source is None:
+        tree = parse(program)
+
+        if prepare is not None:
+            transpiler.checked = prepare(tree)
+
+        try:
+            source = transpiler.transpile(tree)
+        except TranspileError:
+            return Compiler(file, program, no_newlines, max_depth, transpiler.out, transpiler.inp, checked=transpiler.checked, limits=limits).visit(tree)
+
+        if use_cache:
+            save_cache(path, program, source, optimized, transpiler.counted)
+
+    transpiler.run(source)
\ No newline at end of file